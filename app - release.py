@@ -5,31 +5,47 @@
 
 
 import sys
-import os
+import argparse
 import time
+# 启动计时起点，--profile-startup 用它统计模块导入耗时
+STARTUP_BEGIN = time.perf_counter()
 import datetime
-import random
-import requests
+import threading
+import json
+import csv
+import functools
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QTabWidget, QFrame, QGridLayout, QListWidget,
-                             QListWidgetItem, QGroupBox, QFormLayout)
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QDateTime
-from PyQt5.QtGui import QPixmap, QIcon, QFont, QColor, QPalette
-from PyQt5.QtOpenGL import QGLWidget
+                             QTabWidget, QGridLayout, QListWidget,
+                             QListWidgetItem, QListView, QGroupBox, QFormLayout,
+                             QComboBox, QCompleter)
+from PyQt5.QtCore import (Qt, QTimer, QThread, QObject, pyqtSignal,
+                          QAbstractListModel, QModelIndex, QPointF, QRectF)
+from PyQt5.QtGui import (QFont, QColor, QPainter, QPen,
+                         QPolygonF, QStandardItemModel, QStandardItem)
+from PyQt5.QtOpenGL import QGLWidget, QGLFormat
 from OpenGL.GL import *
 from OpenGL.GLU import *
-from OpenGL.GLUT import *
-# 在文件顶部添加geopy相关导入
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from weather_core import WeatherData, CityMonitor, RefreshSchedule
+from weather_particles import RainSystem, SnowSystem
+from weather_scene import compile_scene
+from weather_hourly import HOURLY_HORIZONS
 
 
-# 和风天气API配置
-QWEATHER_KEY = os.environ.get('QWEATHER_KEY', '[Your_Qweather_API_KEY]') #这里需要一个可使用的API KEY
-QWEATHER_BASE_URL = "https://devapi.qweather.com/v7"
-QWEATHER_GEO_URL = "https://geoapi.qweather.com/v2/city"
+# 动画速度以60ms一步标定，实际帧率不同时按经过的时间换算步数
+ANIMATION_STEP = 0.06
+
+# 历史趋势的时间范围：(名称, 时长（秒）, 降采样粒度（秒），0表示原始数据)
+TREND_RANGES = [
+    ("24小时", 24 * 3600, 0),
+    ("7天", 7 * 24 * 3600, 3600),
+    ("30天", 30 * 24 * 3600, 6 * 3600),
+    ("1年", 365 * 24 * 3600, 24 * 3600),
+]
 
 # 天气图标映射
 WEATHER_ICONS = {
@@ -44,416 +60,237 @@ WEATHER_ICONS = {
 }
 
 
-class WeatherData:
-    """天气数据管理类"""
-
-    def __init__(self):
-        self.current = {}
-        self.forecast = []
-        self.last_updated = None
-        self.city = "北京"
-
-    def update_city(self, city):
-        self.city = city
-
-    def get_location_id(self, city):
-        """获取城市的Location ID"""
-        try:
-            response = requests.get(
-                f"{QWEATHER_GEO_URL}/lookup",
-                params={
-                    "location": city,
-                    "key": QWEATHER_KEY,
-                    "lang": "zh"
-                }
-            )
-            data = response.json()
-
-            if data["code"] != "200" or not data["location"]:
-                return None
-
-            # 返回第一个匹配的城市ID
-            return data["location"][0]["id"]
-
-        except Exception as e:
-            print(f"获取城市ID出错: {e}")
-            return None
-
-    def format_time(self, timestamp):
-        """格式化时间戳为本地时间"""
-        try:
-            # 和风天气返回的是UTC时间，需要转换为本地时间
-            utc_time = datetime.datetime.strptime(timestamp, "%Y-%m-%dT%H:%M%z")
-            local_time = utc_time.astimezone()
-            return local_time.strftime("%Y-%m-%d %H:%M")
-        except:
-            return timestamp
-
-    def fetch_weather_data(self):
-        """获取天气数据"""
-        # 先获取城市ID
-        location_id = self.get_location_id(self.city)
-        if not location_id:
-            return {"error": f"无法找到城市: {self.city}"}
-
-        try:
-            # 获取当前天气
-            current_response = requests.get(
-                f"{QWEATHER_BASE_URL}/weather/now",
-                params={
-                    "location": location_id,
-                    "key": QWEATHER_KEY,
-                    "lang": "zh"
-                }
-            )
-            current_data = current_response.json()
-
-            if current_data["code"] != "200":
-                return {"error": "获取实时天气失败"}
-
-            # 获取未来7天预报
-            forecast_response = requests.get(
-                f"{QWEATHER_BASE_URL}/weather/7d",
-                params={
-                    "location": location_id,
-                    "key": QWEATHER_KEY,
-                    "lang": "zh"
-                }
-            )
-            forecast_data = forecast_response.json()
-
-            if forecast_data["code"] != "200":
-                return {"error": "获取天气预报失败"}
-
-            # 获取日出日落信息（从当天预报中获取）
-            daily_data = forecast_data["daily"][0] if forecast_data["daily"] else {}
-
-            # 处理当前天气数据
-            self.current = {
-                "city": current_data["now"].get("obsTime", ""),
-                "temperature": current_data["now"]["temp"],
-                "description": current_data["now"]["text"],
-                "icon": current_data["now"]["icon"],
-                "humidity": current_data["now"]["humidity"],
-                "wind_speed": current_data["now"]["windSpeed"],
-                "wind_dir": current_data["now"]["windDir"],
-                "pressure": current_data["now"]["pressure"],
-                "vis": current_data["now"]["vis"],
-                "feels_like": current_data["now"]["feelsLike"],
-                "sunrise": daily_data.get("sunrise", ""),
-                "sunset": daily_data.get("sunset", ""),
-                "updated_at": self.format_time(current_data["now"]["obsTime"]),
-                "windDir": current_data["now"]["windDir"],
-                "windScale": current_data["now"]["windScale"],
-                "sources":current_data["refer"]["sources"]
-            }
-
-            #示例
-            '''{'code': '200', 'fxLink': 'https://www.qweather.com/weather/beijing-101010100.html', 
-            'now': {'cloud': '7', 'dew': '24', 'feelsLike': '32', 'humidity': '67', 'icon': '101',
-             'obsTime': '2025-07-29T19:16+08:00', 'precip': '0.0', 'pressure': '995', 'temp': '29', 
-             'text': '多云', 'vis': '30', 'wind360': '180', 'windDir': '南风', 'windScale': '2', 'windSpeed': '6'}, 
-             'refer': {'license': ['QWeather Developers License'], 'sources': ['QWeather']},
-              'updateTime': '2025-07-29T19:18+08:00'}
-              
-              "refer" : {
-    "sources" : [ "QWeather" ],
-    "license" : [ "QWeather Developers License" ]
-  }'''
-
-            # 处理未来预报数据
-            self.forecast = []
-            for day in forecast_data["daily"]:
-                date_obj = datetime.datetime.strptime(day["fxDate"], "%Y-%m-%d")
-                self.forecast.append({
-                    "date": date_obj.strftime("%m-%d"),
-                    "day": date_obj.strftime("%A"),
-                    "temp_max": day["tempMax"],
-                    "temp_min": day["tempMin"],
-                    "description": day["textDay"],
-                    "night_desc": day["textNight"],
-                    "icon": day["iconDay"],
-                    "wind_dir": day["windDirDay"],
-                    "wind_scale": day["windScaleDay"],
-                    "precip": day["precip"],
-                    "humidity": day["humidity"]
-                })
-
-            self.last_updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            return {"success": True}
-
-        except Exception as e:
-            print(f"获取天气数据出错: {e}")
-            return {"error": f"获取天气数据失败: {str(e)}"}
-
-
-    def get_public_city(self):
-        """获取公网IP地址，增加重试和备用API"""
-        # 备用IP查询API列表
-        ip_apis = [
-            'https://ipinfo.io/json',
-            'https://ip.cn/json'
-        ]
-
-        for api in ip_apis:
-            try:
-                # 增加超时时间和重试机制
-                for attempt in range(3):  # 每个API重试3次
-                    try:
-                        response = requests.get(api, timeout=8)
-                        return response.json().get('city')
-                    except (requests.exceptions.ConnectionError,
-                        requests.exceptions.Timeout) as e:
-                        print("获取api失败:",e)
-                        continue  # 继续下一次尝试
-            except Exception as e:
-                print(f"使用API {api} 获取IP失败: {e}")
-                continue  # 尝试下一个API
-
-        print("所有IP查询API均失败")
-        return None
-
-    def get_city_by_location(self):
-        """通过IP定位获取城市名"""
-        try:
-            city = self.get_public_city()
-            return city
-        except:
-            print("获取城市失败,未知原因")
-            return None
+def number_text(value):
+    """显示数值，缺失（NaN）时显示 --"""
+    return "--" if value != value else f"{value:g}"
 
 
+@functools.lru_cache(maxsize=None)
+def weather_icon(description):
+    """按天气描述查找图标，描述种类有限，结果缓存"""
+    for key, icon in WEATHER_ICONS.items():
+        if key in description:
+            return icon
+    return "☀️"
 
 
 class WeatherThread(QThread):
-    """天气数据获取线程"""
+    """天气数据获取线程，按数据源的发布时间安排刷新"""
     weather_updated = pyqtSignal(dict)
 
     def __init__(self, weather_data):
         super().__init__()
         self.weather_data = weather_data
+        self.schedule = RefreshSchedule()
         self.running = True
-        self.update_interval = 300  # 5分钟更新一次
+        self._refresh_requested = False
+        self._due = time.monotonic()  # 下一次刷新的时间，启动后立即获取
+        self._cond = threading.Condition()
 
     def run(self):
-        while self.running:
-            result = self.weather_data.fetch_weather_data()
-            self.weather_updated.emit(result)
-            # 等待更新间隔
-            for _ in range(self.update_interval):
+        while True:
+            with self._cond:
+                # 等到刷新时间，停止或手动刷新时立即唤醒
+                while self.running and not self._refresh_requested:
+                    remaining = self._due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
                 if not self.running:
-                    break
-                time.sleep(1)
+                    return
+                self._refresh_requested = False
+
+            # 数据由主线程保存，避免与搜索请求同时修改
+            result = self.weather_data.fetch_city_weather(self.weather_data.city)
+            self.weather_updated.emit(result)
+            delay = self.schedule.next_delay(result)
+            with self._cond:
+                self._due = time.monotonic() + delay
+
+    def refresh(self):
+        """立即刷新当前城市"""
+        with self._cond:
+            self._refresh_requested = True
+            self._cond.notify()
 
     def stop(self):
-        self.running = False
+        with self._cond:
+            self.running = False
+            self._cond.notify()
         self.wait()
 
 
+class RequestPipeline(QObject):
+    """后台请求管道：查询在线程池中执行，只处理最新一次请求的结果"""
+    finished = pyqtSignal(int, object)
+
+    def __init__(self, max_workers=2):
+        super().__init__()
+        self.generation = 0
+        self._callbacks = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-request")
+        # 信号从工作线程发出，槽函数在主线程执行
+        self.finished.connect(self._deliver)
+
+    def submit(self, func, callback):
+        """在后台执行func()，完成后在主线程调用callback(result)；之前的请求将被作废"""
+        self.generation += 1
+        generation = self.generation
+        self._callbacks = {generation: callback}
+        future = self._executor.submit(func)
+        future.add_done_callback(lambda f: self.finished.emit(generation, f))
+        return generation
+
+    def _deliver(self, generation, future):
+        if generation != self.generation:
+            # 已有更新的请求，丢弃过期结果
+            return
+        callback = self._callbacks.pop(generation, None)
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"后台请求出错: {e}")
+            return
+        if callback is not None:
+            callback(result)
+
+    def shutdown(self):
+        self.generation += 1
+        self._callbacks.clear()
+        self._executor.shutdown(wait=False)
+
+
+class MultiCityMonitor(QObject):
+    """多城市监控，通过信号按城市发送天气数据"""
+    city_updated = pyqtSignal(str, dict)
+
+    def __init__(self, weather_data, interval=1800, max_workers=4):
+        super().__init__()
+        # 回调在工作线程中执行，信号会排队送到主线程
+        self.monitor = CityMonitor(weather_data, self.city_updated.emit,
+                                   interval=interval, max_workers=max_workers)
+
+    def add_city(self, city):
+        self.monitor.add_city(city)
+
+    def remove_city(self, city):
+        self.monitor.remove_city(city)
+
+    def start(self):
+        self.monitor.start()
+
+    def stop(self):
+        self.monitor.stop()
+
+
+# 天空配色：天气类别 -> (顶部, 底部, 四周)
+SKY_PALETTES = {
+    "clear": ((0.529, 0.808, 0.922), (0.137, 0.412, 0.557), (0.341, 0.624, 0.812)),  # 晴天 - 蓝色渐变
+    "rain": ((0.5, 0.5, 0.6), (0.3, 0.3, 0.4), (0.4, 0.4, 0.5)),  # 雨天 - 灰色渐变
+    "cloudy": ((0.7, 0.75, 0.8), (0.5, 0.55, 0.6), (0.6, 0.65, 0.7)),  # 多云/阴天 - 灰白色渐变
+    "snow": ((0.8, 0.9, 1.0), (0.6, 0.7, 0.8), (0.7, 0.8, 0.9))  # 雪天 - 蓝白色渐变
+}
+
+# 天空盒六个面的顶点：(配色位置, 四个顶点)
+SKY_FACES = (
+    (0, ((1.0, 1.0, -1.0), (-1.0, 1.0, -1.0), (-1.0, 1.0, 1.0), (1.0, 1.0, 1.0))),  # 顶部
+    (1, ((1.0, -1.0, 1.0), (-1.0, -1.0, 1.0), (-1.0, -1.0, -1.0), (1.0, -1.0, -1.0))),  # 底部
+    (2, ((1.0, 1.0, 1.0), (-1.0, 1.0, 1.0), (-1.0, -1.0, 1.0), (1.0, -1.0, 1.0))),  # 前面
+    (2, ((1.0, -1.0, -1.0), (-1.0, -1.0, -1.0), (-1.0, 1.0, -1.0), (1.0, 1.0, -1.0))),  # 后面
+    (2, ((-1.0, 1.0, 1.0), (-1.0, 1.0, -1.0), (-1.0, -1.0, -1.0), (-1.0, -1.0, 1.0))),  # 左面
+    (2, ((1.0, 1.0, -1.0), (1.0, 1.0, 1.0), (1.0, -1.0, 1.0), (1.0, -1.0, -1.0)))  # 右面
+)
+
+
 class SkyBox:
     """3D天空盒渲染类"""
 
     def __init__(self):
-        self.textures = {}
+        self.display_lists = {}  # 天气类别 -> 显示列表
         self.initialized = False
 
     def initialize(self):
-        """初始化天空盒纹理"""
-        # 这里我们使用颜色渐变代替实际纹理
+        """把每种天气的天空编译为显示列表，需要在GL上下文中调用"""
+        for category, palette in SKY_PALETTES.items():
+            list_id = glGenLists(1)
+            glNewList(list_id, GL_COMPILE)
+            glBegin(GL_QUADS)
+            for color_index, vertices in SKY_FACES:
+                glColor3f(*palette[color_index])
+                for vertex in vertices:
+                    glVertex3f(*vertex)
+            glEnd()
+            glEndList()
+            self.display_lists[category] = list_id
         self.initialized = True
 
-    def render(self, weather_type):
-        """根据天气类型渲染天空盒"""
+    def render(self, category):
+        """渲染指定类别的天空盒"""
         if not self.initialized:
             self.initialize()
 
+        list_id = self.display_lists.get(category)
+        if list_id is None:
+            return
+
         glPushMatrix()
         glDisable(GL_LIGHTING)
         glDisable(GL_DEPTH_TEST)
+        glCallList(list_id)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
+        glPopMatrix()
 
-        # 根据天气类型设置天空颜色
-        if "晴" in weather_type:
-            # 晴天 - 蓝色渐变
-            glBegin(GL_QUADS)
-            # 顶部 - 浅蓝色
-            glColor3f(0.529, 0.808, 0.922)
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-
-            # 底部 - 深蓝色
-            glColor3f(0.137, 0.412, 0.557)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-
-            # 前面
-            glColor3f(0.341, 0.624, 0.812)
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-
-            # 后面
-            glColor3f(0.341, 0.624, 0.812)
-            glVertex3f(1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, -1.0)
-
-            # 左面
-            glColor3f(0.341, 0.624, 0.812)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-
-            # 右面
-            glColor3f(0.341, 0.624, 0.812)
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-            glEnd()
+    def release(self):
+        """删除天空盒的显示列表，需要在GL上下文中调用"""
+        for list_id in self.display_lists.values():
+            glDeleteLists(list_id, 1)
+        self.display_lists.clear()
+        self.initialized = False
 
-        elif "雨" in weather_type or "雷阵" in weather_type:
-            # 雨天 - 灰色渐变
-            glBegin(GL_QUADS)
-            # 顶部
-            glColor3f(0.5, 0.5, 0.6)
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-
-            # 底部
-            glColor3f(0.3, 0.3, 0.4)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-
-            # 其他面
-            glColor3f(0.4, 0.4, 0.5)
-            # 前面
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-
-            # 后面
-            glVertex3f(1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, -1.0)
-
-            # 左面
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-
-            # 右面
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-            glEnd()
 
-        elif "云" in weather_type or "阴" in weather_type:
-            # 多云/阴天 - 灰白色渐变
-            glBegin(GL_QUADS)
-            # 顶部
-            glColor3f(0.7, 0.75, 0.8)
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-
-            # 底部
-            glColor3f(0.5, 0.55, 0.6)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-
-            # 其他面
-            glColor3f(0.6, 0.65, 0.7)
-            # 前面
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-
-            # 后面
-            glVertex3f(1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, -1.0)
-
-            # 左面
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-
-            # 右面
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-            glEnd()
+class MeshCache:
+    """几何体缓存：每种网格只细分一次，编译为显示列表后通过变换重复使用"""
 
-        elif "雪" in weather_type:
-            # 雪天 - 蓝白色渐变
-            glBegin(GL_QUADS)
-            # 顶部
-            glColor3f(0.8, 0.9, 1.0)
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-
-            # 底部
-            glColor3f(0.6, 0.7, 0.8)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-
-            # 其他面
-            glColor3f(0.7, 0.8, 0.9)
-            # 前面
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-
-            # 后面
-            glVertex3f(1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, -1.0)
-
-            # 左面
-            glVertex3f(-1.0, 1.0, 1.0)
-            glVertex3f(-1.0, 1.0, -1.0)
-            glVertex3f(-1.0, -1.0, -1.0)
-            glVertex3f(-1.0, -1.0, 1.0)
-
-            # 右面
-            glVertex3f(1.0, 1.0, -1.0)
-            glVertex3f(1.0, 1.0, 1.0)
-            glVertex3f(1.0, -1.0, 1.0)
-            glVertex3f(1.0, -1.0, -1.0)
-            glEnd()
+    def __init__(self):
+        self._lists = {}  # (类型, 细分参数) -> 显示列表
 
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_LIGHTING)
+    def _get(self, key, build):
+        list_id = self._lists.get(key)
+        if list_id is None:
+            list_id = glGenLists(1)
+            quad = gluNewQuadric()
+            glNewList(list_id, GL_COMPILE)
+            build(quad)
+            glEndList()
+            gluDeleteQuadric(quad)
+            self._lists[key] = list_id
+        return list_id
+
+    def draw_sphere(self, radius, slices=16, stacks=16):
+        """绘制半径为radius的球体"""
+        list_id = self._get(("sphere", slices, stacks),
+                            lambda quad: gluSphere(quad, 1.0, slices, stacks))
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        glCallList(list_id)
+        glPopMatrix()
+
+    def draw_disk(self, radius, slices=32, loops=1):
+        """绘制半径为radius的圆盘"""
+        list_id = self._get(("disk", slices, loops),
+                            lambda quad: gluDisk(quad, 0, 1.0, slices, loops))
+        glPushMatrix()
+        glScalef(radius, radius, radius)
+        glCallList(list_id)
         glPopMatrix()
 
+    def release(self):
+        """删除所有显示列表，需要在GL上下文中调用"""
+        for list_id in self._lists.values():
+            glDeleteLists(list_id, 1)
+        self._lists.clear()
+
 
 class Cloud:
     """3D云朵类"""
@@ -466,10 +303,10 @@ class Cloud:
         self.speed = 0.001 + (size * 0.002)
         self.rotation = 0
 
-    def update(self):
+    def update(self, steps=1.0):
         """更新云朵位置"""
-        self.x -= self.speed
-        self.rotation += 0.01
+        self.x -= self.speed * steps
+        self.rotation += 0.01 * steps
 
         # 云朵移出视野后重新放置到右侧
         if self.x < -2.0:
@@ -477,7 +314,7 @@ class Cloud:
             self.y = np.random.uniform(0.3, 0.8)
             self.z = np.random.uniform(-1.0, 1.0)
 
-    def render(self):
+    def render(self, meshes, detail=16):
         """渲染云朵"""
         glPushMatrix()
         glTranslatef(self.x, self.y, self.z)
@@ -488,110 +325,60 @@ class Cloud:
         glMaterialfv(GL_FRONT, GL_AMBIENT_AND_DIFFUSE, [1.0, 1.0, 1.0, 1.0])
 
         # 主体
-        quad = gluNewQuadric()
-        gluSphere(quad, self.size * 0.4, 16, 16)
+        meshes.draw_sphere(self.size * 0.4, detail, detail)
 
         # 附加部分
         glTranslatef(self.size * 0.3, 0, 0)
-        gluSphere(quad, self.size * 0.3, 16, 16)
+        meshes.draw_sphere(self.size * 0.3, detail, detail)
 
         glTranslatef(-self.size * 0.6, 0, 0)
-        gluSphere(quad, self.size * 0.35, 16, 16)
+        meshes.draw_sphere(self.size * 0.35, detail, detail)
 
         glTranslatef(self.size * 0.2, self.size * 0.2, 0)
-        gluSphere(quad, self.size * 0.3, 16, 16)
+        meshes.draw_sphere(self.size * 0.3, detail, detail)
 
         glTranslatef(0, -self.size * 0.4, 0)
-        gluSphere(quad, self.size * 0.25, 16, 16)
+        meshes.draw_sphere(self.size * 0.25, detail, detail)
 
-        gluDeleteQuadric(quad)
         glPopMatrix()
 
 
-class Raindrop:
-    """雨滴类"""
+class ParticleRenderer:
+    """把粒子顶点上传到VBO，每个粒子系统每帧只需一次绘制调用"""
 
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        """重置雨滴位置"""
-        self.x = np.random.uniform(-1.5, 1.5)
-        self.y = np.random.uniform(0.5, 1.5)
-        self.z = np.random.uniform(-1.0, 1.0)
-        self.length = np.random.uniform(0.03, 0.08)
-        self.speed = np.random.uniform(0.01, 0.03)
-
-    def update(self):
-        """更新雨滴位置"""
-        self.y -= self.speed
-
-        # 雨滴落到地面后重置
-        if self.y < -1.0:
-            self.reset()
-
-    def render(self):
-        """渲染雨滴"""
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-
-        glDisable(GL_LIGHTING)
-        glColor3f(0.5, 0.7, 0.9)
-        glLineWidth(2.0)
-
-        glBegin(GL_LINES)
-        glVertex3f(0, 0, 0)
-        glVertex3f(0, -self.length, 0)
-        glEnd()
+    def __init__(self, mode, color, line_width=1.0):
+        self.mode = mode  # GL_LINES 或 GL_TRIANGLES
+        self.color = color
+        self.line_width = line_width
+        self.vbo = None
 
-        glEnable(GL_LIGHTING)
-        glPopMatrix()
-
-
-class Snowflake:
-    """雪花类"""
-
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        """重置雪花位置"""
-        self.x = np.random.uniform(-1.5, 1.5)
-        self.y = np.random.uniform(0.5, 1.5)
-        self.z = np.random.uniform(-1.0, 1.0)
-        self.size = np.random.uniform(0.01, 0.03)
-        self.speed = np.random.uniform(0.005, 0.015)
-        self.rotation = np.random.uniform(0, 360)
-        self.rotation_speed = np.random.uniform(-1, 1)
-
-    def update(self):
-        """更新雪花位置"""
-        self.y -= self.speed
-        self.x += np.sin(self.y * 2) * 0.005  # 左右摇摆
-        self.rotation += self.rotation_speed
-
-        # 雪花落到地面后重置
-        if self.y < -1.0:
-            self.reset()
-
-    def render(self):
-        """渲染雪花"""
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(self.rotation, 0, 1, 0)
+    def draw(self, vertices):
+        """上传顶点并绘制"""
+        if len(vertices) == 0:
+            return
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
 
         glDisable(GL_LIGHTING)
-        glColor3f(1.0, 1.0, 1.0)
-
-        # 绘制六边形雪花
-        glBegin(GL_POLYGON)
-        for i in range(6):
-            angle = 2 * np.pi * i / 6
-            glVertex3f(np.cos(angle) * self.size, np.sin(angle) * self.size, 0)
-        glEnd()
+        glColor3f(*self.color)
+        glLineWidth(self.line_width)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        # 每帧重新分配缓冲区，驱动可以避免等待上一帧的绘制
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glDrawArrays(self.mode, 0, len(vertices))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
         glEnable(GL_LIGHTING)
-        glPopMatrix()
+
+    def release(self):
+        """释放VBO，需要在GL上下文中调用"""
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
 
 
 class Sun:
@@ -614,7 +401,7 @@ class Sun:
         y = np.cos(rad) * self.radius - 0.3  # 调整Y位置使中午太阳最高
         return x, max(y, -0.5)  # 确保太阳不会低于地平线太多
 
-    def render(self):
+    def render(self, meshes, detail=32):
         """渲染太阳"""
         x, y = self.get_position()
 
@@ -627,48 +414,291 @@ class Sun:
             glColor3f(1.0, 0.8, 0.0)
             glMaterialfv(GL_FRONT, GL_EMISSION, [1.0, 0.8, 0.0, 1.0])
 
-            quad = gluNewQuadric()
-            gluSphere(quad, self.size, 32, 32)
-            gluDeleteQuadric(quad)
+            meshes.draw_sphere(self.size, detail, detail)
 
             # 阳光效果（辉光）
             glDisable(GL_LIGHTING)
             glColor4f(1.0, 0.9, 0.3, 0.3)
-            quad = gluNewQuadric()
-            gluSphere(quad, self.size * 1.5, 32, 32)
-            gluDeleteQuadric(quad)
+            meshes.draw_sphere(self.size * 1.5, detail, detail)
 
             glColor4f(1.0, 0.9, 0.3, 0.1)
-            quad = gluNewQuadric()
-            gluSphere(quad, self.size * 2.0, 32, 32)
-            gluDeleteQuadric(quad)
+            meshes.draw_sphere(self.size * 2.0, detail, detail)
 
             glEnable(GL_LIGHTING)
             glMaterialfv(GL_FRONT, GL_EMISSION, [0.0, 0.0, 0.0, 1.0])
             glPopMatrix()
 
 
+class FrameProfiler:
+    """逐帧分阶段计时：记录各阶段CPU耗时、GL调用次数和滚动帧时间分位数"""
+
+    PHASES = ("update", "sky", "sun", "clouds", "particles", "ground")
+
+    def __init__(self, window=600):
+        self.enabled = False
+        self.frames = deque(maxlen=window)  # 最近若干帧的总耗时（秒）
+        self.last_phases = dict.fromkeys(self.PHASES, 0.0)
+        self.last_gl_calls = 0
+        self.frame_index = 0
+        self._phases = dict.fromkeys(self.PHASES, 0.0)
+        self._gl_calls = 0
+        self._originals = {}  # 被替换的GL函数
+        self._export_file = None
+        self._export_writer = None
+
+    def set_enabled(self, enabled):
+        """开启时替换本模块中的GL函数以统计调用次数，关闭时恢复"""
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        module_globals = globals()
+        if enabled:
+            for name, func in list(module_globals.items()):
+                if name.startswith("gl") and callable(func):
+                    self._originals[name] = func
+                    module_globals[name] = self._counting(func)
+        else:
+            module_globals.update(self._originals)
+            self._originals.clear()
+
+    def _counting(self, func):
+        def wrapper(*args, **kwargs):
+            self._gl_calls += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个阶段的耗时（只包含CPU提交命令的时间，不等待GPU完成）"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[name] += time.perf_counter() - start
+
+    def end_frame(self, frame_time, quality=0):
+        """一帧结束，保存本帧统计并写入导出文件"""
+        if not self.enabled:
+            return
+        self.frames.append(frame_time)
+        self.last_phases = self._phases
+        self.last_gl_calls = self._gl_calls
+        self._phases = dict.fromkeys(self.PHASES, 0.0)
+        self._gl_calls = 0
+        self.frame_index += 1
+
+        if self._export_file is not None:
+            record = {"frame": self.frame_index, "time": round(time.time(), 3),
+                      "total_ms": round(frame_time * 1000, 3)}
+            for name, seconds in self.last_phases.items():
+                record[f"{name}_ms"] = round(seconds * 1000, 3)
+            record["gl_calls"] = self.last_gl_calls
+            record["quality"] = quality
+            if self._export_writer is not None:
+                self._export_writer.writerow(record)
+            else:
+                self._export_file.write(json.dumps(record) + "\n")
+
+    def percentiles(self):
+        """返回最近帧时间的 p50/p95/p99（毫秒）"""
+        if not self.frames:
+            return 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(np.fromiter(self.frames, dtype=np.float64), [50, 95, 99])
+        return p50 * 1000, p95 * 1000, p99 * 1000
+
+    def summary_lines(self):
+        """叠加层显示的文字"""
+        p50, p95, p99 = self.percentiles()
+        lines = [f"帧时间 p50/p95/p99: {p50:.2f} / {p95:.2f} / {p99:.2f} ms"]
+        for name, seconds in self.last_phases.items():
+            lines.append(f"{name}: {seconds * 1000:.2f} ms")
+        lines.append(f"GL调用: {self.last_gl_calls}")
+        return lines
+
+    def start_export(self, path):
+        """开始导出逐帧数据，.csv 导出为CSV，其他扩展名导出为JSON Lines"""
+        self.stop_export()
+        self._export_file = open(path, "w", encoding="utf-8", newline="")
+        if path.lower().endswith(".csv"):
+            fields = ["frame", "time", "total_ms"] + [f"{name}_ms" for name in self.PHASES] + ["gl_calls", "quality"]
+            self._export_writer = csv.DictWriter(self._export_file, fieldnames=fields)
+            self._export_writer.writeheader()
+        self.set_enabled(True)
+
+    @property
+    def exporting(self):
+        return self._export_file is not None
+
+    def stop_export(self):
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
+            self._export_writer = None
+
+
+class FrameScheduler(QObject):
+    """帧调度器：按显示器刷新率驱动动画，不可见时暂停，超出帧时间预算时自动降低画质"""
+
+    IDLE_POLL_MS = 500  # 暂停时检查部件是否重新可见的间隔
+    # 画质等级：(粒子数量比例, 网格细分比例)
+    QUALITY_LEVELS = ((1.0, 1.0), (0.5, 0.75), (0.25, 0.5), (0.1, 0.35))
+    DOWNGRADE_FRAMES = 30  # 连续超出预算的帧数
+    UPGRADE_FRAMES = 300  # 连续低于一半预算的帧数
+
+    def __init__(self, widget, target_fps=None, static_fps=20):
+        super().__init__(widget)
+        self.widget = widget
+        self.target_fps = target_fps or self.display_refresh_rate()
+        self.static_fps = min(static_fps, self.target_fps)  # 没有雨雪时的帧率
+        self.budget = 1.0 / self.target_fps  # 每帧的CPU时间预算（秒）
+        self.quality = 0
+        self.frame_time = 0.0  # 帧时间的指数移动平均
+        self.paused = False
+        self._over_budget = 0
+        self._under_budget = 0
+        self._last_tick = None
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+
+    @staticmethod
+    def display_refresh_rate():
+        """获取主显示器刷新率，无法获取时按60Hz计算"""
+        screen = QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return rate if rate >= 1 else 60.0
+
+    def frame_interval(self):
+        """当前场景的帧间隔（毫秒）"""
+        fps = self.target_fps if self.widget.is_animated() else self.static_fps
+        return max(1, int(1000 / fps))
+
+    def start(self):
+        self._last_tick = None
+        self.paused = False
+        self.timer.start(self.frame_interval())
+
+    def stop(self):
+        self.timer.stop()
+
+    def wake(self):
+        """部件重新显示或场景改变时立即恢复正常帧率"""
+        if self.timer.isActive():
+            self.paused = False
+            self._last_tick = None
+            self.timer.setInterval(self.frame_interval())
+
+    def _visible(self):
+        widget = self.widget
+        return (widget.isVisible() and not widget.window().isMinimized()
+                and not widget.visibleRegion().isEmpty())
+
+    def _tick(self):
+        if not self._visible():
+            if not self.paused:
+                # 最小化或被遮挡时不再模拟和绘制
+                self.paused = True
+                self.timer.setInterval(self.IDLE_POLL_MS)
+            return
+
+        if self.paused:
+            self.paused = False
+            self._last_tick = None
+
+        now = time.perf_counter()
+        if self._last_tick is None:
+            elapsed = self.frame_interval() / 1000.0
+        else:
+            elapsed = min(now - self._last_tick, 0.25)  # 避免卡顿后动画跳跃过大
+        self._last_tick = now
+
+        with self.widget.profiler.phase("update"):
+            self.widget.update_animation(elapsed / ANIMATION_STEP)
+        simulate_time = time.perf_counter() - now
+        self.widget.updateGL()
+        work_time = simulate_time + self.widget.paint_time
+        self.widget.profiler.end_frame(work_time, self.quality)
+        self._record(work_time)
+
+        interval = self.frame_interval()
+        if self.timer.interval() != interval:
+            self.timer.setInterval(interval)
+
+    def _record(self, work_time):
+        """记录一帧的CPU耗时（不含等待垂直同步），必要时调整画质"""
+        if self.frame_time:
+            self.frame_time = 0.9 * self.frame_time + 0.1 * work_time
+        else:
+            self.frame_time = work_time
+
+        if self.frame_time > self.budget:
+            self._over_budget += 1
+            self._under_budget = 0
+        elif self.frame_time < self.budget * 0.5:
+            self._under_budget += 1
+            self._over_budget = 0
+        else:
+            self._over_budget = 0
+            self._under_budget = 0
+
+        if self._over_budget >= self.DOWNGRADE_FRAMES and self.quality < len(self.QUALITY_LEVELS) - 1:
+            self.set_quality(self.quality + 1)
+        elif self._under_budget >= self.UPGRADE_FRAMES and self.quality > 0:
+            self.set_quality(self.quality - 1)
+
+    def set_quality(self, level):
+        self.quality = level
+        self._over_budget = 0
+        self._under_budget = 0
+        self.frame_time = 0.0
+        particle_scale, detail_scale = self.QUALITY_LEVELS[level]
+        self.widget.set_quality(particle_scale, detail_scale)
+
+
 class WeatherGLWidget(QGLWidget):
     """3D天气场景渲染部件"""
+    first_frame = pyqtSignal()  # 第一帧（仅清屏）绘制完成
+    scene_built = pyqtSignal()  # 3D场景构建完成
 
     def __init__(self, parent=None):
-        super().__init__(parent)
+        # 开启垂直同步，帧率与显示器刷新同步
+        gl_format = QGLFormat()
+        gl_format.setSwapInterval(1)
+        super().__init__(gl_format, parent)
         self.weather_type = "晴"
+        self.scene = compile_scene(None, self.weather_type)
+        self._light_changed = True
+        # 第一帧只清屏，光照和天空盒等在之后的帧中才构建，窗口可以尽快显示
+        self.scene_ready = False
+        self._first_frame_done = False
         self.skybox = SkyBox()
+        self.meshes = MeshCache()
         self.sun = Sun()
         self.clouds = [Cloud(np.random.uniform(-2.0, 2.0),
                              np.random.uniform(0.3, 0.8),
                              np.random.uniform(-1.0, 1.0),
                              np.random.uniform(0.1, 0.45)) for _ in range(7)]
-        self.raindrops = [Raindrop() for _ in range(100)]
-        self.snowflakes = [Snowflake() for _ in range(100)]
+        self.particle_count = None  # 为None时使用场景描述中的粒子数量
+        self.particle_scale = 1.0
+        self.detail_scale = 1.0
+        self.rain = RainSystem(0)
+        self.snow = SnowSystem(0)
+        self.rain_renderer = ParticleRenderer(GL_LINES, (0.5, 0.7, 0.9), line_width=2.0)
+        self.snow_renderer = ParticleRenderer(GL_TRIANGLES, (1.0, 1.0, 1.0))
         self.rotation = 0
         self.time_hour = datetime.datetime.now().hour
+        self.paint_time = 0.0  # 上一帧paintGL的耗时（秒）
+        self.profiler = FrameProfiler()
+        self.show_profiler = False  # 按F3切换性能叠加层
+        self.setFocusPolicy(Qt.StrongFocus)
 
-        # 设置定时器更新动画
-        self.animation_timer = QTimer(self)
-        self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_timer.start(60)  # 约33fps
+        # 帧调度器驱动动画
+        self.scheduler = FrameScheduler(self)
+        self.scheduler.start()
 
         # 设置视角
         self.eye_x = 0
@@ -676,13 +706,18 @@ class WeatherGLWidget(QGLWidget):
         self.eye_z = 2
 
     def initializeGL(self):
-        """初始化OpenGL"""
+        """初始化OpenGL，场景资源推迟到 build_scene 中创建"""
         glClearColor(0.5, 0.7, 0.9, 1.0)
+
+    def build_scene(self):
+        """设置光照并创建天空盒等GL资源，在第一帧之后调用"""
         glEnable(GL_DEPTH_TEST)
         glEnable(GL_LIGHTING)
         glEnable(GL_LIGHT0)
         glEnable(GL_COLOR_MATERIAL)
         glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+        # 缓存的网格通过缩放复用，需要重新归一化法线
+        glEnable(GL_NORMALIZE)
 
         # 设置光源
         light_pos = [1.0, 1.0, 1.0, 0.0]  # 方向光
@@ -696,6 +731,22 @@ class WeatherGLWidget(QGLWidget):
         glLightfv(GL_LIGHT0, GL_SPECULAR, light_specular)
 
         self.skybox.initialize()
+        self.scene_ready = True
+        self._light_changed = True
+        self.scene_built.emit()
+
+    def release_scene(self):
+        """窗口关闭时停止动画并释放显示列表和VBO"""
+        self.scheduler.stop()
+        if not self.isValid():
+            return
+        self.makeCurrent()
+        self.skybox.release()
+        self.meshes.release()
+        self.rain_renderer.release()
+        self.snow_renderer.release()
+        self.scene_ready = False
+        self.doneCurrent()
 
     def resizeGL(self, width, height):
         """调整OpenGL视图"""
@@ -707,36 +758,78 @@ class WeatherGLWidget(QGLWidget):
 
     def paintGL(self):
         """绘制OpenGL场景"""
+        start = time.perf_counter()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if not self.scene_ready:
+            if not self._first_frame_done:
+                self._first_frame_done = True
+                self.first_frame.emit()
+                QTimer.singleShot(0, self.updateGL)
+                return
+            self.build_scene()
         glLoadIdentity()
+        scene = self.scene
+
+        # 天气变化后更新光照
+        if self._light_changed:
+            glLightfv(GL_LIGHT0, GL_DIFFUSE, scene.light_diffuse)
+            self._light_changed = False
 
         # 设置相机位置
         gluLookAt(self.eye_x, self.eye_y, self.eye_z,
                   0.0, 0.0, 0.0,
                   0.0, 1.0, 0.0)
 
+        profiler = self.profiler
+
         # 绘制天空盒
-        self.skybox.render(self.weather_type)
+        with profiler.phase("sky"):
+            self.skybox.render(scene.sky)
 
         # 绘制太阳
-        self.sun.update(self.time_hour)
-        self.sun.render()
+        with profiler.phase("sun"):
+            self.sun.update(self.time_hour)
+            self.sun.render(self.meshes, self.detail(32))
 
         # 根据天气类型绘制相应元素
-        if "云" in self.weather_type or "阴" in self.weather_type or "晴" in self.weather_type:
-            for cloud in self.clouds:
-                cloud.render()
+        with profiler.phase("clouds"):
+            if scene.clouds:
+                for cloud in self.clouds:
+                    cloud.render(self.meshes, self.detail(16))
 
-        if "雨" in self.weather_type or "雷阵" in self.weather_type:
-            for raindrop in self.raindrops:
-                raindrop.render()
+        with profiler.phase("particles"):
+            if self.rain.active:
+                self.rain_renderer.draw(self.rain.vertices())
 
-        if "雪" in self.weather_type:
-            for snowflake in self.snowflakes:
-                snowflake.render()
+            if self.snow.active:
+                self.snow_renderer.draw(self.snow.vertices())
 
         # 绘制地面
-        self.render_ground()
+        with profiler.phase("ground"):
+            self.render_ground()
+        self.paint_time = time.perf_counter() - start
+
+        if self.show_profiler:
+            self.render_profiler_overlay()
+
+    def render_profiler_overlay(self):
+        """在左上角显示性能统计"""
+        glDisable(GL_LIGHTING)
+        glColor3f(1.0, 1.0, 1.0)
+        font = QFont("Monospace", 9)
+        lines = self.profiler.summary_lines()
+        lines.append(f"画质等级: {self.scheduler.quality}")
+        for i, line in enumerate(lines):
+            self.renderText(10, 20 + i * 14, line, font)
+        glEnable(GL_LIGHTING)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_F3:
+            self.show_profiler = not self.show_profiler
+            # 没有导出任务时，关闭叠加层也停止统计
+            self.profiler.set_enabled(self.show_profiler or self.profiler.exporting)
+        else:
+            super().keyPressEvent(event)
 
     def render_ground(self):
         """渲染地面"""
@@ -744,53 +837,240 @@ class WeatherGLWidget(QGLWidget):
         glTranslatef(0, -1.0, 0)
         glScalef(5, 0.1, 5)
 
-        # 根据天气设置地面颜色
-        if "雪" in self.weather_type:
-            glColor3f(0.9, 0.95, 1.0)  # 雪地
-        else:
-            glColor3f(0.3, 0.6, 0.2)  # 草地
+        # 根据天气设置地面颜色（草地或雪地）
+        glColor3f(*self.scene.ground_color)
 
         glMaterialfv(GL_FRONT, GL_AMBIENT_AND_DIFFUSE, [0.3, 0.6, 0.2, 1.0])
 
-        quad = gluNewQuadric()
-        gluDisk(quad, 0, 5, 32, 1)
-        gluDeleteQuadric(quad)
+        self.meshes.draw_disk(5, self.detail(32), 1)
         glPopMatrix()
 
-    def update_animation(self):
-        """更新动画元素"""
-        self.rotation += 0.1
+    def update_animation(self, steps=1.0):
+        """更新动画元素，steps为经过的动画步数（每步60ms）"""
+        self.rotation += 0.1 * steps
 
         # 更新云朵
         for cloud in self.clouds:
-            cloud.update()
+            cloud.update(steps)
 
-        # 更新雨滴
-        for raindrop in self.raindrops:
-            raindrop.update()
+        # 只更新当前天气用到的粒子系统
+        if self.rain.active:
+            self.rain.update(steps)
 
-        # 更新雪花
-        for snowflake in self.snowflakes:
-            snowflake.update()
+        if self.snow.active:
+            self.snow.update(steps)
 
         # 更新时间（模拟时间流逝）
         current_time = datetime.datetime.now()
         self.time_hour = current_time.hour + current_time.minute / 60.0
 
-        # 重绘场景
-        self.updateGL()
-
-    def set_weather_type(self, weather_type):
-        """设置天气类型，用于更新3D场景"""
+    def is_animated(self):
+        """是否有需要高帧率的动画（雨雪）"""
+        return self.rain.active or self.snow.active
+
+    def detail(self, slices):
+        """按当前画质缩放网格细分数"""
+        return max(6, int(slices * self.detail_scale))
+
+    def set_particle_count(self, count):
+        """固定雨雪粒子数量，传入None恢复为按天气强度决定"""
+        self.particle_count = count
+        self.apply_particle_budget()
+
+    def apply_particle_budget(self):
+        """按场景描述和当前画质调整粒子数量（画质降低时按比例减少）"""
+        for system, budget in ((self.rain, self.scene.rain_count), (self.snow, self.scene.snow_count)):
+            system.active = budget > 0
+            if not system.active:
+                continue
+            if self.particle_count is not None:
+                budget = self.particle_count
+            count = max(1, int(budget * self.particle_scale))
+            if count != system.count:
+                system.resize(count)
+
+    def set_quality(self, particle_scale, detail_scale):
+        """由帧调度器调用，调整粒子数量和网格细分"""
+        self.particle_scale = particle_scale
+        self.detail_scale = detail_scale
+        self.apply_particle_budget()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scheduler.wake()
+
+    def set_weather_type(self, weather_type, icon=None):
+        """设置天气类型，用于更新3D场景；icon为和风天气图标代码，优先于天气描述"""
         self.weather_type = weather_type
+        scene = compile_scene(icon, weather_type)
+        if scene == self.scene:
+            return
+        self.scene = scene
+        # 光照在下一次paintGL中更新（此时GL上下文可用）
+        self._light_changed = True
+        self.apply_particle_budget()
+        self.scheduler.wake()
+
+
+class ForecastListModel(QAbstractListModel):
+    """预报列表模型，刷新时只通知内容变化的行"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 每行为 (显示文字, 提示文字)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text, tooltip = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == Qt.ToolTipRole:
+            return tooltip
+        return None
 
-        # 根据天气类型调整光照
-        if "晴" in weather_type:
-            glLightfv(GL_LIGHT0, GL_DIFFUSE, [1.0, 1.0, 0.9, 1.0])
-        elif "阴" in weather_type or "云" in weather_type:
-            glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.7, 0.7, 0.7, 1.0])
-        elif "雨" in weather_type or "雪" in weather_type:
-            glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.5, 0.5, 0.6, 1.0])
+    def set_rows(self, rows):
+        """用新数据替换列表：多出的行删除，新增的行插入，其余行逐行比较"""
+        rows = list(rows)
+        old_count, new_count = len(self._rows), len(rows)
+
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            del self._rows[new_count:]
+            self.endRemoveRows()
+
+        # 把连续变化的行合并成一次 dataChanged
+        start = None
+        for row in range(min(old_count, new_count) + 1):
+            changed = row < min(old_count, new_count) and self._rows[row] != rows[row]
+            if changed:
+                self._rows[row] = rows[row]
+                if start is None:
+                    start = row
+            elif start is not None:
+                self.dataChanged.emit(self.index(start), self.index(row - 1),
+                                      [Qt.DisplayRole, Qt.ToolTipRole])
+                start = None
+
+        if new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self._rows.extend(rows[old_count:])
+            self.endInsertRows()
+
+
+def array_polygon(x, y):
+    """把坐标数组直接写入QPolygonF的内存，避免逐点创建QPointF"""
+    polygon = QPolygonF(len(x))
+    buffer = polygon.data()
+    buffer.setsize(len(x) * 2 * np.dtype(np.float64).itemsize)
+    points = np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)
+    points[:, 0] = x
+    points[:, 1] = y
+    return polygon
+
+
+class TimeSeriesChart(QWidget):
+    """时间序列曲线图（逐小时预报、历史趋势），绘图坐标由NumPy列数组整体计算"""
+
+    # 指标名 -> (列名, 单位, 颜色)
+    METRICS = {
+        "温度": ("temp", "°C", QColor(230, 120, 40)),
+        "降水": ("precip", "mm", QColor(60, 130, 220)),
+        "降水概率": ("pop", "%", QColor(90, 160, 230)),
+        "风速": ("wind_speed", "km/h", QColor(90, 170, 110)),
+        "湿度": ("humidity", "%", QColor(120, 110, 200)),
+    }
+    # 这些指标的纵轴从0开始
+    ZERO_BASED = ("precip", "pop", "humidity")
+    MARGINS = (72, 16, 16, 28)  # 左、上、右、下
+
+    def __init__(self, metrics=None, parent=None):
+        super().__init__(parent)
+        self.metrics = list(metrics or self.METRICS)
+        self.metric = self.metrics[0]
+        self.time = np.empty(0, dtype=np.int64)
+        self.columns = {}
+        self.utc_offset = 0
+        self.setMinimumHeight(240)
+
+    def set_data(self, time, columns, utc_offset=0):
+        """time 为UNIX时间戳数组，columns 为 {列名: 数组}"""
+        self.time = time
+        self.columns = columns
+        self.utc_offset = utc_offset
+        self.update()
+
+    def set_hourly(self, hourly):
+        self.set_data(hourly.time, {name: hourly.column(name) for name in hourly.COLUMNS},
+                      hourly.utc_offset)
+
+    def set_metric(self, metric):
+        self.metric = metric
+        self.update()
+
+    def label(self, index, fmt):
+        tz = datetime.timezone(datetime.timedelta(seconds=self.utc_offset))
+        return datetime.datetime.fromtimestamp(int(self.time[index]), tz).strftime(fmt)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        left, top, right, bottom = self.MARGINS
+        width = self.width() - left - right
+        height = self.height() - top - bottom
+        name, unit, color = self.METRICS[self.metric]
+        values = self.columns.get(name, np.empty(0))
+        valid = np.isfinite(values)
+        if width <= 0 or height <= 0 or not valid.any():
+            painter.drawText(self.rect(), Qt.AlignCenter, "暂无数据")
+            return
+
+        low = 0.0 if name in self.ZERO_BASED else float(values[valid].min())
+        high = float(values[valid].max())
+        if high - low < 1e-6:
+            high = low + 1
+
+        # 横坐标按时间比例分布，数据中断的时段不会被压缩
+        span = max(int(self.time[-1] - self.time[0]), 1)
+        baseline = top + height
+        x = left + (self.time - self.time[0]) * (width / span)
+        y = top + (high - np.where(valid, values, low)) / (high - low) * height
+
+        # 曲线下方的半透明填充
+        fill = QColor(color)
+        fill.setAlpha(60)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(fill)
+        painter.drawPolygon(array_polygon(np.concatenate(([x[0]], x, [x[-1]])),
+                                          np.concatenate(([baseline], y, [baseline]))))
+        painter.setPen(QPen(color, 2))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPolyline(array_polygon(x, y))
+
+        # 坐标轴和刻度：一天半以内每6小时一个刻度，更长时按天，最多约8个
+        painter.setPen(self.palette().text().color())
+        painter.drawLine(QPointF(left, baseline), QPointF(left + width, baseline))
+        painter.drawText(QRectF(0, top - 8, left - 6, 16), Qt.AlignRight | Qt.AlignVCenter,
+                         f"{round(high, 1):g}{unit}")
+        painter.drawText(QRectF(0, baseline - 8, left - 6, 16), Qt.AlignRight | Qt.AlignVCenter,
+                         f"{round(low, 1):g}{unit}")
+        hours = span / 3600
+        if hours <= 36:
+            step, fmt = 6, "%H:%M"
+        else:
+            step, fmt = 24 * int(np.ceil(hours / 24 / 8)), "%m-%d"
+        slots = (self.time + self.utc_offset) // 3600 // step
+        for i in np.flatnonzero(np.diff(slots)) + 1:
+            painter.drawLine(QPointF(x[i], baseline), QPointF(x[i], baseline + 4))
+            if x[i] + 30 > self.width():
+                continue
+            painter.drawText(QRectF(x[i] - 40, baseline + 4, 80, bottom - 4),
+                             Qt.AlignHCenter | Qt.AlignTop, self.label(i, fmt))
 
 
 class WeatherMainWindow(QMainWindow):
@@ -799,9 +1079,13 @@ class WeatherMainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.weather_data = WeatherData()
+        self.requests = RequestPipeline()
+        # 切换逐小时预报时长的请求单独排队，不会作废正在进行的定位和搜索
+        self.horizon_requests = RequestPipeline(max_workers=1)
         self.init_ui()
         self.init_threads()
-        self.auto_locate()  # 自动定位
+        # 后台任务在事件循环开始后再启动，不与窗口的首次显示争用CPU
+        QTimer.singleShot(0, self.start_background_tasks)
 
     def init_ui(self):
         """初始化UI"""
@@ -825,10 +1109,21 @@ class WeatherMainWindow(QMainWindow):
         # 搜索框
         search_layout = QHBoxLayout()
         self.city_input = QLineEdit("北京")
+        # 输入时从离线城市索引补全，支持拼音、Location ID 和拼写错误；补全列表不再由Qt按前缀过滤
+        self.city_model = QStandardItemModel(self)
+        self.city_completer = QCompleter(self.city_model, self)
+        self.city_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.city_completer.setCompletionRole(Qt.UserRole)
+        self.city_completer.activated[str].connect(self.on_city_completed)
+        self.city_input.setCompleter(self.city_completer)
+        self.city_input.textEdited.connect(self.update_city_completions)
         self.search_btn = QPushButton("搜索")
         self.search_btn.clicked.connect(self.search_city)
+        self.refresh_btn = QPushButton("刷新")
+        self.refresh_btn.clicked.connect(self.refresh_weather)
         search_layout.addWidget(self.city_input)
         search_layout.addWidget(self.search_btn)
+        search_layout.addWidget(self.refresh_btn)
         right_layout.addLayout(search_layout)
 
         # 状态标签
@@ -850,11 +1145,21 @@ class WeatherMainWindow(QMainWindow):
         self.init_forecast_tab()
         self.tabs.addTab(self.forecast_tab, "未来预报")
 
+        # 逐小时预报图表标签页
+        self.hourly_tab = QWidget()
+        self.init_hourly_tab()
+        self.tabs.addTab(self.hourly_tab, "逐小时")
+
         # 详细信息标签页
         self.details_tab = QWidget()
         self.init_details_tab()
         self.tabs.addTab(self.details_tab, "详细信息")
 
+        # 关注城市标签页
+        self.watch_tab = QWidget()
+        self.init_watch_tab()
+        self.tabs.addTab(self.watch_tab, "关注城市")
+
         # 状态栏显示最后更新时间
         self.statusBar().showMessage("就绪")
 
@@ -918,9 +1223,74 @@ class WeatherMainWindow(QMainWindow):
     def init_forecast_tab(self):
         """初始化预报标签页"""
         layout = QVBoxLayout(self.forecast_tab)
-        self.forecast_list = QListWidget()
+        self.forecast_mode = QComboBox()
+        self.forecast_mode.addItems(["逐天预报", "逐小时预报"])
+        self.forecast_mode.currentIndexChanged.connect(self.refresh_forecast_list)
+        layout.addWidget(self.forecast_mode)
+        self.forecast_model = ForecastListModel(self)
+        self.forecast_list = QListView()
+        # 行高一致时视图只布局和绘制可见行，15天或168小时预报也不会卡顿
+        self.forecast_list.setUniformItemSizes(True)
+        self.forecast_list.setModel(self.forecast_model)
         layout.addWidget(self.forecast_list)
 
+    def init_hourly_tab(self):
+        """初始化逐小时预报标签页"""
+        layout = QVBoxLayout(self.hourly_tab)
+        controls = QHBoxLayout()
+
+        self.horizon_combo = QComboBox()
+        for hours in HOURLY_HORIZONS:
+            self.horizon_combo.addItem(f"{hours}小时", hours)
+        if self.weather_data.hourly_hours in HOURLY_HORIZONS:
+            self.horizon_combo.setCurrentIndex(HOURLY_HORIZONS.index(self.weather_data.hourly_hours))
+        self.horizon_combo.currentIndexChanged.connect(self.on_horizon_changed)
+
+        self.metric_combo = QComboBox()
+        self.metric_combo.addItems(list(TimeSeriesChart.METRICS))
+
+        controls.addWidget(QLabel("时长:"))
+        controls.addWidget(self.horizon_combo)
+        controls.addWidget(QLabel("指标:"))
+        controls.addWidget(self.metric_combo)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.hourly_chart = TimeSeriesChart()
+        self.metric_combo.currentTextChanged.connect(self.hourly_chart.set_metric)
+        layout.addWidget(self.hourly_chart)
+
+    def on_horizon_changed(self):
+        """切换逐小时预报时长，已有数据不够时单独请求一次"""
+        hours = self.horizon_combo.currentData()
+        if hours < self.weather_data.hourly_hours:
+            # 改选较短的时长后，定时刷新也不再请求更长的预报
+            self.weather_data.hourly_hours = hours
+        if len(self.weather_data.hourly) < hours:
+            self.status_label.setText(f"正在获取 {hours} 小时预报...")
+            city = self.weather_data.city
+            self.horizon_requests.submit(lambda: self.weather_data.fetch_city_weather(city, hourly_hours=hours),
+                                         functools.partial(self.on_horizon_fetched, hours))
+        self.refresh_hourly()
+
+    def on_horizon_fetched(self, hours, result):
+        """更长的逐小时预报获取成功后，定时刷新也改为请求该时长；失败时（如免费版API KEY）保持原来的设置"""
+        self.on_weather_updated(result)
+        if result.get("city") != self.weather_data.city or "error" in result:
+            return
+        if result.get("hourly") is not None:
+            # 请求期间又改选了较短的时长时不再采用
+            if self.horizon_combo.currentData() == hours:
+                self.weather_data.hourly_hours = hours
+        else:
+            self.status_label.setText(f"无法获取 {hours} 小时预报，继续使用 {self.weather_data.hourly_hours} 小时预报")
+
+    def refresh_hourly(self):
+        """按当前选择的时长更新图表和逐小时列表"""
+        self.hourly_chart.set_hourly(self.weather_data.hourly.head(self.horizon_combo.currentData()))
+        if self.forecast_mode.currentIndex() == 1:
+            self.refresh_forecast_list()
+
     def init_details_tab(self):
         """初始化详细信息标签页"""
         layout = QVBoxLayout(self.details_tab)
@@ -941,13 +1311,118 @@ class WeatherMainWindow(QMainWindow):
         form_layout.addRow("最后更新:", self.detail_updated)
 
         layout.addWidget(form_group)
-        layout.addStretch(1)
+
+        # 历史趋势：从本地历史库按时间范围降采样后绘制
+        trend_group = QGroupBox("历史趋势")
+        trend_layout = QVBoxLayout(trend_group)
+        controls = QHBoxLayout()
+        self.trend_range = QComboBox()
+        for label, span, bucket in TREND_RANGES:
+            self.trend_range.addItem(label, (span, bucket))
+        self.trend_range.currentIndexChanged.connect(self.refresh_trend)
+        self.trend_chart = TimeSeriesChart(["温度", "湿度", "风速", "降水"])
+        self.trend_metric = QComboBox()
+        self.trend_metric.addItems(self.trend_chart.metrics)
+        self.trend_metric.currentTextChanged.connect(self.trend_chart.set_metric)
+        controls.addWidget(QLabel("范围:"))
+        controls.addWidget(self.trend_range)
+        controls.addWidget(QLabel("指标:"))
+        controls.addWidget(self.trend_metric)
+        controls.addStretch()
+        trend_layout.addLayout(controls)
+        trend_layout.addWidget(self.trend_chart)
+
+        layout.addWidget(trend_group, 1)
+
+    def refresh_trend(self):
+        """查询当前城市的历史实况并更新趋势图"""
+        span, bucket = self.trend_range.currentData()
+        end = time.time()
+        # 按城市当地时区分段和显示刻度，还没有实况时使用本机时区
+        current = self.weather_data.current
+        if current is not None:
+            utc_offset = int(current.time.utcoffset().total_seconds())
+        else:
+            utc_offset = time.localtime().tm_gmtoff
+        history = self.weather_data.history
+        if bucket:
+            series = history.downsample(self.weather_data.city, end - span, end, bucket, utc_offset)
+        else:
+            series = history.observations(self.weather_data.city, end - span, end)
+        self.trend_chart.set_data(series["time"], series, utc_offset)
+
+    def init_watch_tab(self):
+        """初始化关注城市标签页"""
+        layout = QVBoxLayout(self.watch_tab)
+
+        add_layout = QHBoxLayout()
+        self.watch_input = QLineEdit()
+        self.watch_input.setPlaceholderText("输入要关注的城市")
+        self.watch_btn = QPushButton("添加")
+        self.watch_btn.clicked.connect(self.add_watched_city)
+        add_layout.addWidget(self.watch_input)
+        add_layout.addWidget(self.watch_btn)
+        layout.addLayout(add_layout)
+
+        self.watch_list = QListWidget()
+        layout.addWidget(self.watch_list)
+        self.watch_items = {}
 
     def init_threads(self):
         """初始化数据获取线程"""
         self.weather_thread = WeatherThread(self.weather_data)
         self.weather_thread.weather_updated.connect(self.on_weather_updated)
+
+        self.city_monitor = MultiCityMonitor(self.weather_data)
+        self.city_monitor.city_updated.connect(self.on_city_monitored)
+
+    def start_background_tasks(self):
+        """启动数据获取线程和自动定位"""
         self.weather_thread.start()
+        self.city_monitor.start()
+        self.auto_locate()  # 自动定位
+
+    def add_watched_city(self):
+        """添加关注城市"""
+        city = self.watch_input.text().strip()
+        if not city or city in self.watch_items:
+            return
+        item = QListWidgetItem(f"{city}: 正在获取天气数据...")
+        self.watch_list.addItem(item)
+        self.watch_items[city] = item
+        self.watch_input.clear()
+        self.city_monitor.add_city(city)
+
+    def on_city_monitored(self, city, result):
+        """处理关注城市的天气数据"""
+        item = self.watch_items.get(city)
+        if item is None:
+            return
+        if "error" in result:
+            item.setText(f"{city}: 错误: {result['error']}")
+            return
+        current = result["current"]
+        item.setText(
+            f"{city}: {current.text} {number_text(current.temp)}°C, "
+            f"湿度 {number_text(current.humidity)}%, {current.wind_dir} {current.wind_scale}级 "
+            f"(更新于 {result['last_updated']:%Y-%m-%d %H:%M:%S})"
+        )
+
+    def update_city_completions(self, text):
+        """按输入内容更新补全列表，显示城市所属地区"""
+        index = self.weather_data.city_index
+        self.city_model.clear()
+        for city in index.search(text):
+            region = " ".join(dict.fromkeys(name for name in (city.adm1, city.adm2) if name and name != city.name))
+            item = QStandardItem(f"{city.name}  {region}" if region else city.name)
+            item.setData(index.label(city), Qt.UserRole)
+            item.setToolTip(city.id)
+            self.city_model.appendRow(item)
+
+    def on_city_completed(self, city):
+        """选中补全项后直接搜索"""
+        self.city_input.setText(city)
+        self.search_city()
 
     def search_city(self):
         """搜索城市天气"""
@@ -955,103 +1430,176 @@ class WeatherMainWindow(QMainWindow):
         if city:
             self.status_label.setText(f"正在获取 {city} 的天气数据...")
             self.weather_data.update_city(city)
-            # 立即获取数据
-            QTimer.singleShot(100, lambda: self.weather_thread.weather_updated.emit(
-                self.weather_data.fetch_weather_data()
-            ))
+            self.request_weather(city)
+
+    def refresh_weather(self):
+        """立即刷新当前城市的天气"""
+        self.status_label.setText(f"正在刷新 {self.weather_data.city} 的天气数据...")
+        self.weather_thread.refresh()
+
+    def request_weather(self, city):
+        """在后台立即获取城市天气，快速连续搜索时只显示最后一次的结果"""
+        self.requests.submit(lambda: self.weather_data.fetch_city_weather(city),
+                             self.on_weather_updated)
 
     def on_weather_updated(self, result):
         """处理天气数据更新"""
+        if result.get("city", self.weather_data.city) != self.weather_data.city:
+            # 城市已切换，忽略旧城市的数据
+            return
+
         if "error" in result:
             self.status_label.setText(f"错误: {result['error']}")
             return
 
-        self.status_label.setText(f"天气数据更新于: {self.weather_data.last_updated}")
-        self.statusBar().showMessage(f"最后更新: {self.weather_data.last_updated}")
+        self.weather_data.apply_result(result)
+
+        last_updated = f"{self.weather_data.last_updated:%Y-%m-%d %H:%M:%S}"
+        self.status_label.setText(f"天气数据更新于: {last_updated}")
+        self.statusBar().showMessage(f"最后更新: {last_updated}")
 
         # 更新当前天气信息
         current = self.weather_data.current
-        self.city_info.setText(f"{current['city']}")
-        self.temp_label.setText(f"{current['temperature']}°C")
-
-        # 获取天气图标
-        weather_icon = "☀️"
-        for key, icon in WEATHER_ICONS.items():
-            if key in current["description"]:
-                weather_icon = icon
-                break
-
-        self.desc_label.setText(f"{weather_icon} {current['description']}")
-        self.feels_like_label.setText(f"{current['feels_like']}°C")
-        self.humidity_label.setText(f"{current['humidity']}%")
-        self.wind_label.setText(f"{current['wind_dir']} {current['wind_speed']} km/h")
-        self.pressure_label.setText(f"{current['pressure']} hPa")
-        self.sunrise_label.setText(f"日出: {current['sunrise']}")
-        self.sunset_label.setText(f"日落: {current['sunset']}")
+        # 观测时间转换为本机时区显示
+        observed = f"{current.time.astimezone():%Y-%m-%d %H:%M}"
+        self.city_info.setText(observed)
+        self.temp_label.setText(f"{number_text(current.temp)}°C")
+
+        self.desc_label.setText(f"{weather_icon(current.text)} {current.text}")
+        self.feels_like_label.setText(f"{number_text(current.feels_like)}°C")
+        self.humidity_label.setText(f"{number_text(current.humidity)}%")
+        self.wind_label.setText(f"{current.wind_dir} {number_text(current.wind_speed)} km/h")
+        self.pressure_label.setText(f"{number_text(current.pressure)} hPa")
+        # 日出日落来自当天的预报
+        forecast = self.weather_data.forecast
+        self.sunrise_label.setText(f"日出: {forecast.sunrise[0] if len(forecast) else ''}")
+        self.sunset_label.setText(f"日落: {forecast.sunset[0] if len(forecast) else ''}")
 
         # 更新详细信息
-        self.detail_vis.setText(f"{current['vis']} km")
-        self.windDir.setText(current['windDir'])
-        self.windScale.setText(f"{current['windScale']}级")
-        self.detail_updated.setText(current['updated_at'])
-
-        # 更新预报列表
-        self.forecast_list.clear()
-        for day in self.weather_data.forecast:
-            # 获取天气图标
-            day_icon = "☀️"
-            for key, icon in WEATHER_ICONS.items():
-                if key in day["description"]:
-                    day_icon = icon
-                    break
-
-            item = QListWidgetItem(
-                f"{day['date']} {day['day']}: {day_icon} {day['description']}, "
-                f"最高 {day['temp_max']}°C, 最低 {day['temp_min']}°C, "
-                f"{day['wind_dir']} {day['wind_scale']}级"
-            )
-            self.forecast_list.addItem(item)
+        self.detail_vis.setText(f"{number_text(current.vis)} km")
+        self.windDir.setText(current.wind_dir)
+        self.windScale.setText(f"{current.wind_scale}级")
+        self.detail_updated.setText(observed)
+
+        # 更新预报列表和逐小时图表
+        self.refresh_forecast_list()
+        self.hourly_chart.set_hourly(self.weather_data.hourly.head(self.horizon_combo.currentData()))
+        self.refresh_trend()
 
         # 更新3D场景
-        self.gl_widget.set_weather_type(current["description"])
+        self.gl_widget.set_weather_type(current.text, current.icon)
+
+    def refresh_forecast_list(self):
+        """按所选模式显示逐天或逐小时预报"""
+        if self.forecast_mode.currentIndex() == 1:
+            hourly = self.weather_data.hourly.head(self.horizon_combo.currentData())
+            self.forecast_model.set_rows(self.hourly_rows(hourly))
+        else:
+            self.forecast_model.set_rows(self.forecast_row(day) for day in self.weather_data.forecast)
+
+    def hourly_rows(self, hourly):
+        """生成逐小时预报的 (显示文字, 提示文字)"""
+        columns = zip(hourly.text.tolist(), hourly.temp.tolist(), hourly.precip.tolist(),
+                      hourly.wind_speed.tolist(), hourly.pop.tolist(), hourly.humidity.tolist())
+        for i, (text, temp, precip, wind, pop, humidity) in enumerate(columns):
+            yield (f"{hourly.label(i)}: {weather_icon(text)} {text}, {number_text(temp)}°C, "
+                   f"降水 {number_text(precip)} mm, 风速 {number_text(wind)} km/h",
+                   f"降水概率 {number_text(pop)}%，湿度 {number_text(humidity)}%")
+
+    def forecast_row(self, day):
+        """生成一天预报的 (显示文字, 提示文字)"""
+        text = (f"{day.date:%m-%d %A}: {weather_icon(day.text_day)} {day.text_day}, "
+                f"最高 {number_text(day.temp_max)}°C, 最低 {number_text(day.temp_min)}°C, "
+                f"{day.wind_dir} {day.wind_scale}级")
+        tooltip = (f"夜间: {day.text_night}，降水 {number_text(day.precip)} mm，"
+                   f"湿度 {number_text(day.humidity)}%")
+        return text, tooltip
 
     def auto_locate(self):
         """自动定位并更新城市"""
         self.status_label.setText("正在自动定位...")
-        tmp = self.weather_data.get_city_by_location()
-        if tmp is not None:
-            city = tmp
-        else:
+        self.requests.submit(self.weather_data.get_city_by_location, self.on_located)
+
+    def on_located(self, city):
+        """定位完成后获取当地天气"""
+        if city is None:
             print("获取城市失败，使用默认参数：北京")
             city = "北京"
-        if city:
-            self.city_input.setText(city)
-            self.weather_data.update_city(city)
-            self.status_label.setText(f"已定位到: {city}，正在获取天气数据...")
-            # 立即获取数据
-            QTimer.singleShot(100, lambda: self.weather_thread.weather_updated.emit(
-                self.weather_data.fetch_weather_data()
-            ))
-        else:
-            self.status_label.setText("自动定位失败，使用默认城市")
+        self.city_input.setText(city)
+        self.weather_data.update_city(city)
+        self.status_label.setText(f"已定位到: {city}，正在获取天气数据...")
+        self.request_weather(city)
 
     def closeEvent(self, event):
         """窗口关闭时停止线程"""
+        self.requests.shutdown()
+        self.horizon_requests.shutdown()
         self.weather_thread.stop()
+        self.city_monitor.stop()
+        self.gl_widget.profiler.stop_export()
+        self.gl_widget.release_scene()
+        self.weather_data.close()
         event.accept()
 
 
+class StartupProfiler:
+    """记录启动各阶段的耗时"""
+
+    def __init__(self, begin):
+        self.begin = begin
+        self.last = begin
+        self.phases = []  # (阶段名, 耗时秒)
+
+    def mark(self, name):
+        """结束一个阶段，耗时从上一个阶段结束时算起"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = [f"{name}: {elapsed * 1000:.1f} ms" for name, elapsed in self.phases]
+        lines.append(f"合计: {(self.last - self.begin) * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
 if __name__ == "__main__":
-    # 初始化OpenGL
-    glutInit(sys.argv)
+    parser = argparse.ArgumentParser(description="天气应用")
+    parser.add_argument("--profile-render", metavar="PATH",
+                        help="导出逐帧渲染耗时，.csv 为CSV格式，其他为JSON Lines")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="输出启动各阶段（导入、界面构建、首帧、场景构建）的耗时")
+    args, qt_args = parser.parse_known_args()
 
-    app = QApplication(sys.argv)
+    startup = StartupProfiler(STARTUP_BEGIN)
+    startup.mark("导入模块")
+
+    app = QApplication(sys.argv[:1] + qt_args)
 
     # 设置全局字体，确保中文显示正常
     font = QFont("SimHei")
     app.setFont(font)
+    startup.mark("创建QApplication")
 
     window = WeatherMainWindow()
+    if args.profile_render:
+        window.gl_widget.profiler.start_export(args.profile_render)
+    startup.mark("构建界面")
     window.show()
 
+    if args.profile_startup:
+        window.gl_widget.first_frame.connect(lambda: startup.mark("显示窗口和首帧"))
+
+        def report_startup():
+            startup.mark("构建3D场景")
+            print(startup.report())
+
+        def report_without_gl():
+            # 没有可用的OpenGL上下文时不会绘制，只输出已有的阶段
+            if not window.gl_widget.scene_ready:
+                print(startup.report())
+                print("5秒内未绘制3D场景，请检查OpenGL环境")
+
+        window.gl_widget.scene_built.connect(report_startup)
+        QTimer.singleShot(5000, report_without_gl)
+
     sys.exit(app.exec_())
@@ -0,0 +1,114 @@
+# 历史库性能测试：写入多个城市多年的5分钟实况，测量写入速度和各种时间范围的查询延迟
+#
+#     python benchmarks/bench_history.py --cities 5 --days 365
+#
+# 数据库写入临时目录，不影响用户的历史记录
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from weather_history import WeatherHistory
+from weather_records import Observation, parse_datetime
+
+SAMPLE_INTERVAL = 300
+
+# (名称, 时间范围（秒）, 聚合粒度（秒），0表示原始数据)
+QUERIES = [
+    ("24小时原始数据", 24 * 3600, 0),
+    ("7天按小时", 7 * 24 * 3600, 3600),
+    ("30天按6小时", 30 * 24 * 3600, 6 * 3600),
+    ("1年按天", 365 * 24 * 3600, 24 * 3600),
+    ("1年按30分钟（不使用汇总表）", 365 * 24 * 3600, 1800),
+]
+
+
+def synthetic_observations(end, days, rng):
+    """生成以5分钟为间隔的实况数据，气温包含日变化和季节变化"""
+    stamps = np.arange(end - days * 24 * 3600, end, SAMPLE_INTERVAL, dtype=np.int64)
+    hours = stamps / 3600
+    temp = 15 + 10 * np.sin(hours / 24 / 365 * 2 * np.pi) + 5 * np.sin(hours / 24 * 2 * np.pi)
+    temp += rng.normal(0, 0.5, len(stamps))
+    local = (stamps + 8 * 3600).astype("datetime64[s]")
+    obs_times = np.char.add(np.datetime_as_string(local, unit="m"), "+08:00")
+    humidity = rng.uniform(30, 90, len(stamps))
+    for obs_time, t, h in zip(obs_times.tolist(), temp.round(1).tolist(), humidity.round().tolist()):
+        yield Observation(time=parse_datetime(obs_time), temp=t, feels_like=t, humidity=h,
+                          wind_speed=8.0, wind_dir="南风", wind_scale="2", pressure=1005.0,
+                          vis=25.0, precip=0.0, text="多云", icon="101")
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return np.asarray(samples) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="天气历史库性能测试")
+    parser.add_argument("--cities", type=int, default=5, help="城市数量")
+    parser.add_argument("--days", type=int, default=365, help="每个城市的历史天数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的重复次数")
+    parser.add_argument("--seed", type=int, default=12345, help="随机种子，保证多次运行可比")
+    parser.add_argument("--output", help="保存结果的JSON文件")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    end = int(time.time()) // SAMPLE_INTERVAL * SAMPLE_INTERVAL
+    cities = [f"城市{i:03d}" for i in range(args.cities)]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        history = WeatherHistory(os.path.join(data_dir, "history.db"))
+        rows = 0
+        start = time.perf_counter()
+        for city in cities:
+            for now in synthetic_observations(end, args.days, rng):
+                history.record_observation(city, now, end)
+                rows += 1
+        write_s = time.perf_counter() - start
+        size_mb = os.path.getsize(history.path) / 1024 / 1024
+
+        queries = {}
+        for name, span, bucket in QUERIES:
+            span = min(span, args.days * 24 * 3600)
+            if bucket:
+                query = lambda: history.downsample(cities[0], end - span, end, bucket)
+            else:
+                query = lambda: history.observations(cities[0], end - span, end)
+            samples, result = timed(query, args.repeat)
+            queries[name] = {
+                "points": int(len(result["time"])),
+                "p50_ms": round(float(np.percentile(samples, 50)), 3),
+                "p95_ms": round(float(np.percentile(samples, 95)), 3)
+            }
+        history.close()
+
+    print(f"写入: {args.cities}个城市 x {args.days}天, {rows} 条实况, {write_s:.2f} s, "
+          f"{rows / write_s:.0f} 条/s, 数据库 {size_mb:.1f} MB")
+    for name, result in queries.items():
+        print(f"{name}: {result['points']} 个点, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+
+    if args.output:
+        report = {
+            "config": vars(args),
+            "write": {"rows": rows, "seconds": round(write_s, 3), "size_mb": round(size_mb, 2)},
+            "queries": queries
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# 网络层性能测试：启动本地模拟服务器，测量单个城市的获取延迟和多个城市的吞吐量
+#
+#     python benchmarks/bench_network.py --latency 50 --cities 200 --concurrency 8
+#
+# 不需要API KEY和外网；城市ID缓存写入临时目录，不影响用户缓存
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_qweather import MockQWeatherServer
+from weather_core import WeatherData
+
+
+def latency_summary(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(samples.mean()), 2),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "max_ms": round(float(samples.max()), 2)
+    }
+
+
+def timed_fetch(weather_data, city):
+    start = time.perf_counter()
+    result = weather_data.fetch_city_weather(city)
+    return time.perf_counter() - start, "error" not in result
+
+
+def bench_single_city(weather_data, city, rounds):
+    """同一城市重复获取：第一次包含城市查询，之后应命中缓存"""
+    cold, _ = timed_fetch(weather_data, city)
+    samples = []
+    errors = 0
+    for _ in range(rounds):
+        elapsed, ok = timed_fetch(weather_data, city)
+        samples.append(elapsed)
+        errors += not ok
+    result = latency_summary(samples)
+    result["cold_ms"] = round(cold * 1000, 2)
+    result["errors"] = errors
+    return result
+
+
+def bench_many_cities(weather_data, server, cities, concurrency):
+    """并发获取多个城市，统计吞吐量"""
+    requests_before = server.request_count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda city: timed_fetch(weather_data, city), cities))
+    total = time.perf_counter() - start
+
+    result = latency_summary([elapsed for elapsed, _ in outcomes])
+    result.update({
+        "cities": len(cities),
+        "concurrency": concurrency,
+        "total_s": round(total, 3),
+        "cities_per_s": round(len(cities) / total, 2),
+        "requests_per_s": round((server.request_count - requests_before) / total, 2),
+        "errors": sum(1 for _, ok in outcomes if not ok)
+    })
+    return result
+
+
+def bench_burst(weather_data, server, city, callers):
+    """多个调用者同时刷新同一城市（定时器、搜索、自动定位同时触发的情况），统计实际发出的请求"""
+    requests_before = server.request_count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        outcomes = list(executor.map(lambda _: timed_fetch(weather_data, city), range(callers)))
+    total = time.perf_counter() - start
+    return {
+        "callers": callers,
+        "requests": server.request_count - requests_before,
+        "total_ms": round(total * 1000, 2),
+        "errors": sum(1 for _, ok in outcomes if not ok)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网络层性能测试（使用本地模拟服务器）")
+    parser.add_argument("--latency", type=float, default=50.0, help="模拟服务器固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=10.0, help="模拟服务器随机延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务器错误率（0-1）")
+    parser.add_argument("--rounds", type=int, default=20, help="单城市测试的重复次数")
+    parser.add_argument("--cities", type=int, default=100, help="多城市测试的城市数量")
+    parser.add_argument("--concurrency", type=int, default=8, help="多城市测试的并发数")
+    parser.add_argument("--burst", type=int, default=8, help="同时刷新同一城市的调用者数量")
+    parser.add_argument("--seed", type=int, default=12345, help="随机种子，保证多次运行可比")
+    parser.add_argument("--output", help="保存结果的JSON文件")
+    args = parser.parse_args()
+
+    server = MockQWeatherServer(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                                error_rate=args.error_rate, seed=args.seed).start()
+    cities = [f"城市{i:04d}" for i in range(args.cities)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["WEATHER_CACHE_DIR"] = cache_dir
+        weather_data = WeatherData(base_url=server.base_url, geo_url=server.geo_url, key="mock", daily_quota=0)
+        try:
+            single = bench_single_city(weather_data, "北京", args.rounds)
+            many_cold = bench_many_cities(weather_data, server, cities, args.concurrency)
+            many_warm = bench_many_cities(weather_data, server, cities, args.concurrency)
+            burst = bench_burst(weather_data, server, "上海", args.burst)
+            transport = weather_data.transport.stats()
+            flights = weather_data.flights.stats()
+            cache = weather_data.location_cache.stats()
+        finally:
+            weather_data.close()
+            server.stop()
+
+    print(f"单城市 ({args.rounds}次): 首次 {single['cold_ms']} ms, "
+          f"之后 p50 {single['p50_ms']} ms, p95 {single['p95_ms']} ms")
+    for label, result in (("多城市（冷缓存）", many_cold), ("多城市（热缓存）", many_warm)):
+        print(f"{label}: {result['cities']}个城市, 并发{result['concurrency']}, "
+              f"{result['total_s']} s, {result['cities_per_s']} 城市/s, {result['requests_per_s']} 请求/s, "
+              f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, 错误 {result['errors']}")
+    print(f"同城并发刷新: {burst['callers']}个调用者, 发出 {burst['requests']} 个请求, "
+          f"耗时 {burst['total_ms']} ms, 错误 {burst['errors']}")
+    for kind, stats in flights.items():
+        print(f"请求合并 {kind}: 执行 {stats['executed']} 次, 合并 {stats['coalesced']} 次 "
+              f"({stats['coalesced_rate']:.1%})")
+    for host, stats in transport.items():
+        print(f"连接复用 {host}: {stats['requests']} 个请求, {stats['connections']} 个连接")
+    print(f"城市ID缓存命中率: {cache['hit_rate']:.1%}")
+
+    if args.output:
+        report = {
+            "config": vars(args),
+            "single_city": single,
+            "many_cities_cold": many_cold,
+            "many_cities_warm": many_warm,
+            "burst": burst,
+            "single_flight": flights,
+            "transport": transport,
+            "location_cache": cache
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# 3D天气场景性能测试
+#
+# 纯模拟（不需要OpenGL和显示器）:
+#     python benchmarks/bench_render.py --no-gl
+# 离屏渲染（Mesa llvmpipe软件渲染，适合无GPU、无显示器的Linux机器）:
+#     python benchmarks/bench_render.py --output result.json
+#   没有显示器时默认使用EGL pbuffer（Mesa surfaceless），否则使用Qt离屏上下文，可用 --gl-backend 指定
+# 与之前的结果对比:
+#     python benchmarks/bench_render.py --output new.json --compare result.json
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from weather_particles import RainSystem, SnowSystem
+from weather_scene import compile_scene
+
+WEATHER_TYPES = ["晴", "多云", "雨", "雪", "雷阵雨"]
+PARTICLE_COUNTS = [100, 1000, 10000, 100000]
+
+
+def max_rss_mb():
+    """进程的峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def summarize(frame_times, simulate_times):
+    frame_times = np.asarray(frame_times)
+    simulate_times = np.asarray(simulate_times)
+    return {
+        "fps": round(1.0 / frame_times.mean(), 2),
+        "frame_ms_p50": round(np.percentile(frame_times, 50) * 1000, 3),
+        "frame_ms_p95": round(np.percentile(frame_times, 95) * 1000, 3),
+        "simulate_ms": round(simulate_times.mean() * 1000, 3)
+    }
+
+
+class SimulationScene:
+    """不依赖OpenGL的场景：只模拟粒子并生成顶点，规则与WeatherGLWidget一致"""
+
+    def __init__(self, weather_type, count, seed):
+        scene = compile_scene(None, weather_type)
+        self.rain = RainSystem(count, seed=seed)
+        self.snow = SnowSystem(count, seed=seed + 1)
+        self.rain.active = scene.rain_count > 0
+        self.snow.active = scene.snow_count > 0
+
+    def step(self):
+        for system in (self.rain, self.snow):
+            if system.active:
+                system.update()
+                system.vertices()
+
+
+def time_vertices(system, elapsed):
+    """包装粒子系统的 vertices()，把每次调用的耗时累加到 elapsed[0]"""
+    original = system.vertices
+
+    def vertices():
+        start = time.perf_counter()
+        try:
+            return original()
+        finally:
+            elapsed[0] += time.perf_counter() - start
+
+    system.vertices = vertices
+
+
+def bench_simulation(weather_type, count, frames, warmup, seed):
+    tracemalloc.start()
+    scene = SimulationScene(weather_type, count, seed)
+    for _ in range(warmup):
+        scene.step()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    simulate_times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        scene.step()
+        simulate_times.append(time.perf_counter() - start)
+
+    result = summarize(simulate_times, simulate_times)
+    result["peak_traced_mb"] = round(peak / (1024 * 1024), 2)
+    return result
+
+
+def load_app():
+    """加载 app - release.py（文件名含空格，不能直接import）"""
+    path = os.path.join(ROOT, "app - release.py")
+    spec = importlib.util.spec_from_file_location("weather_app", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def default_gl_backend():
+    """没有显示器的Linux机器上Qt offscreen平台无法创建OpenGL上下文，改用EGL"""
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return "egl"
+    return "qt"
+
+
+class OffscreenRenderer:
+    """在离屏上下文中驱动WeatherGLWidget的绘制函数"""
+
+    def __init__(self, width, height, backend):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+        if backend == "egl":
+            # 必须在导入PyOpenGL之前设置
+            os.environ["PYOPENGL_PLATFORM"] = "egl"
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+        self.app_module = load_app()
+        from PyQt5.QtWidgets import QApplication
+        self.qt_app = QApplication.instance() or QApplication(sys.argv[:1])
+
+        if backend == "egl":
+            self._create_egl_context(width, height)
+        else:
+            self._create_qt_context(width, height)
+
+        self.widget = self.app_module.WeatherGLWidget()
+        self.widget.scheduler.stop()  # 由测试循环驱动，不使用定时器
+        self.widget.initializeGL()
+        self.widget.build_scene()  # 应用中在第一帧之后才构建，测试时直接构建
+        self.widget.resizeGL(width, height)
+        # 顶点在 paintGL 中生成，单独计时后计入模拟耗时，与 --no-gl 模式的统计口径一致
+        self.vertex_time = [0.0]
+        time_vertices(self.widget.rain, self.vertex_time)
+        time_vertices(self.widget.snow, self.vertex_time)
+
+        gl = self.app_module
+        self.renderer_name = gl.glGetString(gl.GL_RENDERER).decode(errors="replace")
+        self.glFinish = gl.glFinish
+
+    def _create_egl_context(self, width, height):
+        """创建EGL pbuffer上下文（不需要X11或Wayland）"""
+        import ctypes
+        from OpenGL import EGL
+
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise SystemExit("无法初始化EGL，请确认已安装Mesa（llvmpipe）")
+
+        config_attributes = (EGL.EGLint * 13)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE
+        )
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(display, config_attributes, ctypes.pointer(config), 1,
+                                   ctypes.pointer(count)) or count.value == 0:
+            raise SystemExit("没有可用的EGL配置")
+
+        surface_attributes = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+        self.surface = EGL.eglCreatePbufferSurface(display, config, surface_attributes)
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+        if not EGL.eglMakeCurrent(display, self.surface, self.surface, self.context):
+            raise SystemExit("无法激活EGL上下文")
+
+    def _create_qt_context(self, width, height):
+        """创建Qt离屏上下文和帧缓冲对象"""
+        from PyQt5.QtGui import (QOffscreenSurface, QOpenGLContext, QSurfaceFormat,
+                                 QOpenGLFramebufferObject, QOpenGLFramebufferObjectFormat)
+
+        surface_format = QSurfaceFormat()
+        surface_format.setDepthBufferSize(24)
+        surface_format.setVersion(2, 1)
+        surface_format.setProfile(QSurfaceFormat.CompatibilityProfile)
+
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(surface_format)
+        self.surface.create()
+
+        self.context = QOpenGLContext()
+        self.context.setFormat(surface_format)
+        if not self.context.create() or not self.context.makeCurrent(self.surface):
+            raise SystemExit("无法创建离屏OpenGL上下文，请确认已安装Mesa（llvmpipe）")
+
+        fbo_format = QOpenGLFramebufferObjectFormat()
+        fbo_format.setAttachment(QOpenGLFramebufferObject.CombinedDepthStencil)
+        self.fbo = QOpenGLFramebufferObject(width, height, fbo_format)
+        self.fbo.bind()
+
+    def bench(self, weather_type, count, frames, warmup, seed):
+        widget = self.widget
+        np.random.seed(seed)
+        widget.rain.rng = np.random.default_rng(seed)
+        widget.snow.rng = np.random.default_rng(seed + 1)
+
+        vertex_time = self.vertex_time
+        tracemalloc.start()
+        widget.set_weather_type(weather_type)
+        widget.set_particle_count(count)
+        for _ in range(warmup):
+            widget.update_animation()
+            widget.paintGL()
+        self.glFinish()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        frame_times = []
+        simulate_times = []
+        for _ in range(frames):
+            vertex_time[0] = 0.0
+            start = time.perf_counter()
+            widget.update_animation()
+            simulated = time.perf_counter()
+            widget.paintGL()
+            # 等待软件渲染完成，帧时间包含光栅化
+            self.glFinish()
+            end = time.perf_counter()
+            frame_times.append(end - start)
+            simulate_times.append(simulated - start + vertex_time[0])
+
+        result = summarize(frame_times, simulate_times)
+        result["peak_traced_mb"] = round(peak / (1024 * 1024), 2)
+        return result
+
+
+def compare(results, baseline_path):
+    """打印与之前结果的帧率对比"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["mode"], r["weather"], r["particles"]): r for r in baseline["results"]}
+    print(f"\n与 {baseline_path} 对比（帧率变化）:")
+    for result in results:
+        old = previous.get((result["mode"], result["weather"], result["particles"]))
+        if old is None:
+            continue
+        change = (result["fps"] / old["fps"] - 1) * 100 if old["fps"] else 0.0
+        print(f"  {result['mode']:<10} {result['weather']:<4} {result['particles']:>7}: "
+              f"{old['fps']:>9.1f} -> {result['fps']:>9.1f} fps ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="3D天气场景性能测试")
+    parser.add_argument("--no-gl", action="store_true", help="只测试粒子模拟，不创建OpenGL上下文")
+    parser.add_argument("--weather", nargs="+", default=WEATHER_TYPES, help="天气类型")
+    parser.add_argument("--particles", nargs="+", type=int, default=PARTICLE_COUNTS, help="粒子数量")
+    parser.add_argument("--frames", type=int, default=200, help="每组测试的帧数")
+    parser.add_argument("--warmup", type=int, default=20, help="预热帧数")
+    parser.add_argument("--size", default="800x600", help="离屏渲染分辨率")
+    parser.add_argument("--gl-backend", choices=["egl", "qt"], default=default_gl_backend(),
+                        help="离屏OpenGL上下文的创建方式")
+    parser.add_argument("--seed", type=int, default=12345, help="随机种子，保证多次运行可比")
+    parser.add_argument("--output", help="保存结果的JSON文件")
+    parser.add_argument("--compare", metavar="JSON", help="与之前保存的结果对比")
+    args = parser.parse_args()
+
+    mode = "simulate" if args.no_gl else "render"
+    meta = {
+        "mode": mode,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "frames": args.frames,
+        "seed": args.seed
+    }
+
+    renderer = None
+    if not args.no_gl:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        renderer = OffscreenRenderer(width, height, args.gl_backend)
+        meta["gl_backend"] = args.gl_backend
+        meta["gl_renderer"] = renderer.renderer_name
+        meta["size"] = args.size
+        print(f"OpenGL渲染器: {renderer.renderer_name}")
+
+    print(f"{'天气':<6}{'粒子数':>8}{'FPS':>10}{'帧p50(ms)':>12}{'帧p95(ms)':>12}"
+          f"{'模拟(ms)':>10}{'内存峰值(MB)':>14}")
+    results = []
+    for weather_type in args.weather:
+        for count in args.particles:
+            if renderer is None:
+                result = bench_simulation(weather_type, count, args.frames, args.warmup, args.seed)
+            else:
+                result = renderer.bench(weather_type, count, args.frames, args.warmup, args.seed)
+            result.update({"mode": mode, "weather": weather_type, "particles": count})
+            results.append(result)
+            print(f"{weather_type:<6}{count:>8}{result['fps']:>10.1f}{result['frame_ms_p50']:>12.3f}"
+                  f"{result['frame_ms_p95']:>12.3f}{result['simulate_ms']:>10.3f}"
+                  f"{result['peak_traced_mb']:>14.2f}")
+
+    meta["max_rss_mb"] = max_rss_mb()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+# 本地模拟的和风天气服务器，用于在没有API KEY和网络的情况下测试 WeatherData
+#
+#     python benchmarks/mock_qweather.py --port 8080 --latency 80 --error-rate 0.05
+#     export QWEATHER_BASE_URL=http://127.0.0.1:8080/v7
+#     export QWEATHER_GEO_URL=http://127.0.0.1:8080/v2/city
+#
+# 实现了 /v2/city/lookup、/v7/weather/now 和 /v7/weather/{3,7,10,15,30}d 和 /v7/weather/{24,72,168}h
+
+import argparse
+import datetime
+import functools
+import gzip
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def location_id_for(name):
+    """为城市名生成稳定的模拟Location ID"""
+    return str(101000000 + zlib.crc32(name.encode("utf-8")) % 999999)
+
+
+def default_lookup(params):
+    name = params.get("location", "北京")
+    return {
+        "code": "200",
+        "location": [{
+            "name": name,
+            "id": location_id_for(name),
+            "lat": "39.90",
+            "lon": "116.40",
+            "adm2": name,
+            "adm1": name,
+            "country": "中国",
+            "tz": "Asia/Shanghai",
+            "utcOffset": "+08:00",
+            "type": "city",
+            "rank": "10"
+        }],
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+    }
+
+
+def default_now(params):
+    now = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=8)))
+    obs_time = now.replace(minute=now.minute // 10 * 10, second=0, microsecond=0)
+    return {
+        "code": "200",
+        "updateTime": now.strftime("%Y-%m-%dT%H:%M+08:00"),
+        "now": {
+            "obsTime": obs_time.strftime("%Y-%m-%dT%H:%M+08:00"),
+            "temp": "24", "feelsLike": "26", "icon": "101", "text": "多云",
+            "wind360": "180", "windDir": "南风", "windScale": "2", "windSpeed": "8",
+            "humidity": "65", "precip": "0.0", "pressure": "1005", "vis": "25",
+            "cloud": "40", "dew": "17"
+        },
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+    }
+
+
+def default_daily(params, days=7):
+    today = datetime.date.today()
+    texts = ["晴", "多云", "小雨", "阴", "雷阵雨", "晴", "多云"]
+    icons = ["100", "101", "305", "104", "302", "100", "101"]
+    daily = []
+    for i in range(days):
+        day = today + datetime.timedelta(days=i)
+        daily.append({
+            "fxDate": day.isoformat(), "sunrise": "05:12", "sunset": "19:32",
+            "tempMax": str(28 + i % 3), "tempMin": str(18 + i % 2),
+            "iconDay": icons[i % 7], "textDay": texts[i % 7], "iconNight": "151", "textNight": "多云",
+            "windDirDay": "南风", "windScaleDay": "1-3", "windSpeedDay": "8",
+            "humidity": "60", "precip": "0.0", "pressure": "1005", "vis": "25", "uvIndex": "5"
+        })
+    return {
+        "code": "200",
+        "updateTime": datetime.datetime.now().strftime("%Y-%m-%dT%H:%M+08:00"),
+        "daily": daily,
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+    }
+
+
+def default_hourly(params, hours=24):
+    tz = datetime.timezone(datetime.timedelta(hours=8))
+    start = datetime.datetime.now(tz).replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    texts = ["晴", "多云", "阴", "小雨"]
+    icons = ["100", "101", "104", "305"]
+    hourly = []
+    for i in range(hours):
+        stamp = start + datetime.timedelta(hours=i)
+        # 气温按昼夜变化，午后最高
+        temp = 22 + 6 * math.sin((stamp.hour - 9) / 24 * 2 * math.pi)
+        weather = i // 6 % 4
+        hourly.append({
+            "fxTime": stamp.strftime("%Y-%m-%dT%H:%M+08:00"),
+            "temp": str(round(temp)), "icon": icons[weather], "text": texts[weather],
+            "wind360": "180", "windDir": "南风", "windScale": "1-3", "windSpeed": str(6 + i % 5),
+            "humidity": str(55 + weather * 8), "pop": str(weather * 20),
+            "precip": "1.2" if weather == 3 else "0.0",
+            "pressure": "1005", "cloud": str(weather * 25), "dew": "16"
+        })
+    return {
+        "code": "200",
+        "updateTime": datetime.datetime.now(tz).strftime("%Y-%m-%dT%H:%M+08:00"),
+        "hourly": hourly,
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+    }
+
+
+ROUTES = {
+    "/v2/city/lookup": ("lookup", default_lookup),
+    "/v7/weather/now": ("now", default_now),
+}
+# 逐天预报支持和风天气提供的全部天数
+for _days in (3, 7, 10, 15, 30):
+    ROUTES[f"/v7/weather/{_days}d"] = (f"{_days}d", functools.partial(default_daily, days=_days))
+for _hours in (24, 72, 168):
+    ROUTES[f"/v7/weather/{_hours}h"] = (f"{_hours}h", functools.partial(default_hourly, hours=_hours))
+
+
+class MockQWeatherServer:
+    """可配置延迟、错误率和返回数据的模拟服务器"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 payload_dir=None, seed=None):
+        self.latency = latency  # 每个请求的固定延迟（秒）
+        self.jitter = jitter  # 额外的随机延迟上限（秒）
+        self.error_rate = error_rate  # 返回错误的概率
+        self.payloads = {}  # 路由名 -> 固定返回的JSON
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        if payload_dir:
+            for name, _ in ROUTES.values():
+                path = os.path.join(payload_dir, f"{name}.json")
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        self.payloads[name] = json.load(f)
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def root_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        """对应 QWEATHER_BASE_URL"""
+        return f"{self.root_url}/v7"
+
+    @property
+    def geo_url(self):
+        """对应 QWEATHER_GEO_URL"""
+        return f"{self.root_url}/v2/city"
+
+    def start(self):
+        """在后台线程中运行"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-qweather", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _respond(self, path, params):
+        """返回 (HTTP状态码, JSON数据)"""
+        route = ROUTES.get(path)
+        if route is None:
+            return 404, {"code": "404"}
+
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            return 200, {"code": "500"}
+
+        name, default = route
+        if name in self.payloads:
+            return 200, self.payloads[name]
+        return 200, default(params)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持长连接
+            disable_nagle_algorithm = True  # 避免小响应被延迟确认拖慢
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                status, data = server._respond(parts.path, params)
+
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟和风天气服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="固定延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的概率（0-1）")
+    parser.add_argument("--payload-dir", help="包含 lookup.json、now.json、7d.json 的目录，用于替换默认数据")
+    args = parser.parse_args()
+
+    server = MockQWeatherServer(args.host, args.port, args.latency / 1000, args.jitter / 1000,
+                                args.error_rate, args.payload_dir)
+    print(f"模拟服务器已启动: {server.root_url}")
+    print(f"  QWEATHER_BASE_URL={server.base_url}")
+    print(f"  QWEATHER_GEO_URL={server.geo_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
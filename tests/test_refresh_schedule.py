@@ -0,0 +1,82 @@
+# RefreshSchedule 的刷新间隔估计：python -m pytest tests
+
+import datetime
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from weather_core import RefreshSchedule
+
+START = 1_700_000_000
+
+
+def success(city, obs_time):
+    return {"success": True, "city": city,
+            "current": SimpleNamespace(time=datetime.datetime.fromtimestamp(obs_time, datetime.timezone.utc))}
+
+
+class RefreshScheduleTest(unittest.TestCase):
+
+    def learn(self, schedule, city="北京", interval=510, count=6):
+        """按固定间隔发布的实况，返回最后一次的观测时间"""
+        obs_time = START
+        for _ in range(count):
+            schedule.next_delay(success(city, obs_time), now=obs_time + 30)
+            obs_time += interval
+        return obs_time - interval
+
+    def test_learns_publish_interval(self):
+        schedule = RefreshSchedule(seed=1)
+        self.learn(schedule)
+        self.assertLess(schedule.publish_interval, 560)
+
+    def test_error_keeps_learned_interval(self):
+        schedule = RefreshSchedule(seed=1)
+        last = self.learn(schedule)
+        learned = schedule.publish_interval
+        schedule.next_delay(success("北京", last), now=last + 700)  # 数据未更新
+        self.assertEqual(schedule.unchanged, 1)
+
+        delay = schedule.next_delay({"error": "获取实时天气失败", "city": "北京"}, now=last + 800)
+        self.assertGreater(delay, 0)
+        self.assertEqual(schedule.failures, 1)
+        self.assertEqual(schedule.publish_interval, learned)
+
+        schedule.next_delay(success("北京", last), now=last + 900)
+        self.assertEqual(schedule.publish_interval, learned)
+        self.assertEqual(schedule.unchanged, 2)
+        self.assertEqual(schedule.failures, 0)
+
+    def test_error_does_not_change_estimate(self):
+        # 失败（无论是否带城市名）前后的估计与从未失败时相同
+        for error in ({"error": "获取天气数据失败"}, {"error": "获取天气数据失败", "city": "北京"}):
+            control = RefreshSchedule(seed=1)
+            schedule = RefreshSchedule(seed=1)
+            last = self.learn(control)
+            self.learn(schedule)
+            schedule.next_delay(error, now=last + 60)
+            expected = control.next_delay(success("北京", last + 510), now=last + 540)
+            self.assertEqual(schedule.next_delay(success("北京", last + 510), now=last + 540), expected)
+            self.assertEqual(schedule.publish_interval, control.publish_interval)
+
+    def test_city_change_resets(self):
+        schedule = RefreshSchedule(seed=1)
+        self.learn(schedule)
+        schedule.next_delay(success("上海", START), now=START + 30)
+        self.assertEqual(schedule.publish_interval, schedule.default_publish_interval)
+        self.assertEqual(schedule.unchanged, 0)
+
+    def test_failures_back_off(self):
+        schedule = RefreshSchedule(backoff_base=15, backoff_cap=600, seed=1)
+        delays = [schedule.next_delay({"error": "x", "city": "北京"}, now=START) for _ in range(8)]
+        self.assertLessEqual(delays[0], 15)
+        self.assertGreaterEqual(delays[-1], 300)
+        self.assertTrue(all(delay <= 600 for delay in delays))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+# 离线城市索引：城市名、拼音和Location ID的前缀与模糊匹配，用于搜索框的自动补全和免联网的城市查询
+#
+# 随程序附带的 cities.tsv 可以用和风天气的城市列表重新生成（https://github.com/qwd/LocationList）：
+#
+#     python weather_cities.py --import China-City-List-latest.csv
+#
+# 联网查询到的城市会追加到缓存目录下的索引文件，下次直接使用
+
+import argparse
+import bisect
+import csv
+import os
+import sys
+import threading
+from typing import NamedTuple
+
+# 随程序附带的城市列表
+BUNDLED_CITIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.tsv")
+FILE_HEADER = "# Location_ID\t名称\t拼音\t省级行政区\t地级行政区\n"
+
+
+class City(NamedTuple):
+    id: str
+    name: str
+    pinyin: str = ""
+    adm1: str = ""
+    adm2: str = ""
+
+
+def normalize(text):
+    """检索键：小写，去掉空格、连字符和隔音符号，"Xi'an" 与 "xian" 相同"""
+    return "".join(ch for ch in text.strip().lower() if ch not in " -'’")
+
+
+def _variants(key):
+    """键本身和删除一个字符后的所有变体，两个键有共同变体时编辑距离不超过2（替换、插入、删除或相邻交换）"""
+    result = {key}
+    if len(key) < 3 and not key.isascii():
+        # 两个字的中文名删除一个字后只剩一个字，会与所有含这个字的城市相同（朝阳与沈阳），只保留键本身
+        return result
+    for i in range(len(key)):
+        result.add(key[:i] + key[i + 1:])
+    return result
+
+
+def read_cities(path):
+    """读取索引文件，每行 ID、名称、拼音、省、市，以制表符分隔"""
+    cities = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) >= 2:
+                cities.append(City(*fields[:5]))
+    return cities
+
+
+class CityIndex:
+    """城市索引：排序的检索键数组上二分查找前缀，删除变体表上查找拼写错误"""
+
+    def __init__(self, path=BUNDLED_CITIES, user_path=None):
+        self.user_path = user_path  # 联网查询结果写入的文件
+        self.cities = []
+        self._ids = {}  # Location ID -> 序号
+        self._exact = {}  # 检索键 -> [序号, ...]
+        self._keys = []  # 排序后的检索键
+        self._owners = []  # 与 _keys 一一对应的城市序号
+        self._fuzzy = None  # 删除变体 -> 序号集合，第一次模糊匹配时建立
+        self._lock = threading.Lock()
+
+        for source in (path, user_path):
+            if not source or not os.path.exists(source):
+                continue
+            try:
+                for city in read_cities(source):
+                    self._insert(city)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"读取城市索引 {source} 失败: {e}")
+
+        pairs = sorted((key, owner) for owner, city in enumerate(self.cities) for key in self._city_keys(city))
+        self._keys = [key for key, _ in pairs]
+        self._owners = [owner for _, owner in pairs]
+
+    def __len__(self):
+        return len(self.cities)
+
+    @staticmethod
+    def _city_keys(city):
+        return dict.fromkeys(key for key in map(normalize, (city.name, city.pinyin, city.id)) if key)
+
+    @staticmethod
+    def _rank(city):
+        """排序依据：地级市本身排在同名或同前缀的区县之前"""
+        return (city.name != city.adm2, len(city.name), city.id)
+
+    def _insert(self, city):
+        """加入城市，只更新 ID 和精确匹配表，返回序号；已存在时返回None"""
+        if city.id in self._ids:
+            return None
+        owner = len(self.cities)
+        self.cities.append(city)
+        self._ids[city.id] = owner
+        for key in self._city_keys(city):
+            self._exact.setdefault(key, []).append(owner)
+        return owner
+
+    def _build_fuzzy(self):
+        fuzzy = {}
+        for key, owner in zip(self._keys, self._owners):
+            # Location ID 不参与模糊匹配
+            if len(key) > 1 and not key.isdigit():
+                for variant in _variants(key):
+                    fuzzy.setdefault(variant, set()).add(owner)
+        self._fuzzy = fuzzy
+
+    def get(self, location_id):
+        with self._lock:
+            owner = self._ids.get(location_id)
+            return None if owner is None else self.cities[owner]
+
+    def label(self, city):
+        """搜索框中使用的名称，有同名城市时附上所属地区，如 "朝阳（辽宁）" """
+        with self._lock:
+            if len(self._exact.get(city.name, ())) < 2:
+                return city.name
+        region = city.adm2 if city.adm2 and city.adm2 != city.name else city.adm1
+        return f"{city.name}（{region}）" if region else city.name
+
+    def resolve(self, text):
+        """名称、拼音、"名称（地区）" 或 Location ID 精确匹配时返回 Location ID，否则返回None"""
+        name, _, region = text.replace("(", "（").replace(")", "）").partition("（")
+        region = region.rstrip("）").strip()
+        with self._lock:
+            owners = self._exact.get(normalize(name), ())
+            candidates = [self.cities[owner] for owner in owners]
+        if region:
+            candidates = [city for city in candidates if region in (city.adm1, city.adm2)]
+        if not candidates:
+            return None
+        return min(candidates, key=self._rank).id
+
+    def search(self, text, limit=10, scan=500):
+        """先按前缀匹配，不足 limit 个时补充拼写相近的城市；scan 限制短前缀时检查的键数"""
+        query = normalize(text)
+        if not query:
+            return []
+        if query.isdigit():
+            # Location ID 按编号顺序即可，不必检查更多的键
+            scan = limit
+        with self._lock:
+            matches = {}  # 序号 -> (是否完全相同, 排序依据)
+            start = bisect.bisect_left(self._keys, query)
+            for i in range(start, min(start + scan, len(self._keys))):
+                key = self._keys[i]
+                if not key.startswith(query):
+                    break
+                owner = self._owners[i]
+                order = (key != query, self._rank(self.cities[owner]))
+                matches[owner] = min(order, matches.get(owner, order))
+            found = sorted(matches, key=matches.get)[:limit]
+
+            if len(found) < limit and len(query) > 1 and not query.isdigit():
+                if self._fuzzy is None:
+                    self._build_fuzzy()
+                similar = set()
+                for variant in _variants(query):
+                    similar.update(self._fuzzy.get(variant, ()))
+                similar.difference_update(found)
+                found.extend(sorted(similar, key=lambda owner: self._rank(self.cities[owner]))[:limit - len(found)])
+            return [self.cities[owner] for owner in found]
+
+    def add(self, city):
+        """加入联网查询到的城市并写入用户索引文件，已存在时返回False"""
+        with self._lock:
+            owner = self._insert(city)
+            if owner is None:
+                return False
+            for key in self._city_keys(city):
+                position = bisect.bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+                self._owners.insert(position, owner)
+                if self._fuzzy is not None and len(key) > 1 and not key.isdigit():
+                    for variant in _variants(key):
+                        self._fuzzy.setdefault(variant, set()).add(owner)
+
+            if self.user_path:
+                try:
+                    new_file = not os.path.exists(self.user_path)
+                    with open(self.user_path, "a", encoding="utf-8") as f:
+                        if new_file:
+                            f.write(FILE_HEADER)
+                        f.write("\t".join(field.replace("\t", " ") for field in city) + "\n")
+                except OSError as e:
+                    print(f"写入城市索引失败: {e}")
+            return True
+
+
+def import_location_list(source, output=BUNDLED_CITIES):
+    """把和风天气的 China-City-List CSV 转换为索引文件，返回城市数"""
+    cities = []
+    with open(source, encoding="utf-8-sig", newline="") as f:
+        rows = csv.reader(f)
+        # 文件第一行是版本信息，表头从 Location_ID 开始
+        for header in rows:
+            if header and header[0] == "Location_ID":
+                break
+        columns = {name: i for i, name in enumerate(header)}
+        for row in rows:
+            if len(row) < len(columns):
+                continue
+            cities.append(City(
+                row[columns["Location_ID"]],
+                row[columns["Location_Name_ZH"]],
+                row[columns["Location_Name_EN"]].lower(),
+                row[columns["Adm1_Name_ZH"]],
+                row[columns["Adm2_Name_ZH"]],
+            ))
+    cities.sort()
+    with open(output, "w", encoding="utf-8", newline="\n") as f:
+        f.write(FILE_HEADER)
+        for city in cities:
+            f.write("\t".join(city) + "\n")
+    return len(cities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成离线城市索引或测试城市匹配")
+    parser.add_argument("--import", dest="source", help="和风天气的 China-City-List CSV 文件")
+    parser.add_argument("--output", default=BUNDLED_CITIES, help="生成的索引文件")
+    parser.add_argument("query", nargs="*", help="要匹配的城市名、拼音或ID")
+    args = parser.parse_args()
+
+    if args.source:
+        count = import_location_list(args.source, args.output)
+        print(f"已写入 {count} 个城市到 {args.output}")
+        return 0
+
+    index = CityIndex(args.output)
+    for query in args.query:
+        print(f"{query}: 精确匹配 {index.resolve(query)}")
+        for city in index.search(query):
+            print(f"  {index.label(city)}\t{city.id}\t{city.pinyin}\t{city.adm1} {city.adm2}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# 命令行批量获取天气，不依赖PyQt和OpenGL，可以在没有显示器的服务器上由cron定时运行
+#
+#     python weather_cli.py 北京 上海 广州
+#     python weather_cli.py -f cities.txt --format csv -o weather.csv --concurrency 8 --rate 5
+#
+# 每个城市一条记录，获取完成后立即输出：NDJSON（默认）每行一个JSON对象，CSV每行一个城市
+
+import argparse
+import csv
+import json
+import math
+import sys
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from weather_core import WeatherData, TokenBucket
+
+# CSV 列：城市、错误信息、实况各字段、当天最高最低气温、获取时间
+CSV_FIELDS = ["city", "error", "obs_time", "temp", "feels_like", "humidity", "wind_speed",
+              "wind_dir", "wind_scale", "pressure", "vis", "precip", "text", "icon",
+              "today_max", "today_min", "fetched_at"]
+
+
+def read_cities(args):
+    """合并命令行和文件中的城市，去掉空行、#注释和重复项"""
+    names = list(args.cities)
+    if args.file:
+        stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        with stream:
+            names.extend(line.split("#", 1)[0].strip() for line in stream)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _json_value(value):
+    """NaN 不是合法的JSON，输出为 null"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def to_record(city, result, hourly):
+    """把 fetch_city_weather 的结果转换为可序列化的字典"""
+    if "error" in result:
+        return {"city": city, "error": result["error"]}
+
+    current = result["current"]._asdict()
+    current["time"] = current["time"].isoformat()
+    current["sources"] = list(current["sources"])
+    forecast = []
+    for day in result["forecast"]:
+        day = day._asdict()
+        day["date"] = day["date"].isoformat()
+        forecast.append({key: _json_value(value) for key, value in day.items()})
+
+    record = {
+        "city": city,
+        "fetched_at": result["last_updated"].isoformat(timespec="seconds"),
+        "current": {key: _json_value(value) for key, value in current.items()},
+        "forecast": forecast
+    }
+    if hourly and result["hourly"] is not None:
+        data = result["hourly"]
+        record["hourly"] = {"time": data.time.tolist(), "text": data.text.tolist()}
+        for name in data.COLUMNS:
+            record["hourly"][name] = [_json_value(value) for value in data.column(name).tolist()]
+    return record
+
+
+def csv_row(record):
+    """NDJSON记录展开为一行CSV"""
+    if "error" in record:
+        return {"city": record["city"], "error": record["error"]}
+    current = record["current"]
+    row = {"city": record["city"], "obs_time": current["time"], "fetched_at": record["fetched_at"]}
+    for name in CSV_FIELDS:
+        if name in current:
+            row[name] = current[name]
+    if record["forecast"]:
+        row["today_max"] = record["forecast"][0]["temp_max"]
+        row["today_min"] = record["forecast"][0]["temp_min"]
+    return row
+
+
+class BatchFetcher:
+    """有界并发 + 令牌桶限速地获取多个城市"""
+
+    def __init__(self, weather_data, concurrency=4, rate=5.0, burst=10, hourly=False):
+        self.weather_data = weather_data
+        self.concurrency = concurrency
+        self.hourly = hourly
+        # 每个城市请求实况和逐天预报，可选逐小时预报，未缓存的城市还需一次城市查询
+        self.cost = 3 if hourly else 2
+        self.bucket = TokenBucket(rate, max(burst, self.cost + 1))
+
+    def _acquire(self, tokens):
+        while not self.bucket.try_acquire(tokens):
+            time.sleep(self.bucket.time_until(tokens))
+
+    def _fetch(self, city):
+        cost = self.cost
+        if self.weather_data.location_cache.get(city) is None:
+            cost += 1
+        self._acquire(cost)
+        try:
+            result = self.weather_data.fetch_city_weather(city, hourly=self.hourly)
+        except Exception as e:
+            result = {"error": f"获取天气数据失败: {e}", "city": city}
+        return to_record(city, result, self.hourly)
+
+    def run(self, cities):
+        """按完成顺序逐个产出记录"""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="weather-cli") as executor:
+            futures = [executor.submit(self._fetch, city) for city in cities]
+            for future in as_completed(futures):
+                yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量获取多个城市的天气，输出NDJSON或CSV")
+    parser.add_argument("cities", nargs="*", help="城市名")
+    parser.add_argument("-f", "--file", help="城市列表文件，每行一个城市，- 表示标准输入")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="输出格式")
+    parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时获取的城市数")
+    parser.add_argument("--rate", type=float, default=5.0, help="每秒最多发出的请求数")
+    parser.add_argument("--burst", type=int, default=10, help="允许的突发请求数")
+    parser.add_argument("--hourly", action="store_true", help="同时获取逐小时预报（仅NDJSON输出）")
+    parser.add_argument("--days", type=int, help="逐天预报天数（3/7/10/15/30）")
+    args = parser.parse_args(argv)
+
+    cities = read_cities(args)
+    if not cities:
+        parser.error("请在命令行或 --file 中指定至少一个城市")
+
+    # 批量获取由 --rate 和 --burst 限速，不使用 WeatherData 按每日配额计算的令牌桶
+    weather_data = WeatherData(daily_quota=0)
+    if args.days:
+        weather_data.forecast_days = args.days
+    fetcher = BatchFetcher(weather_data, args.concurrency, args.rate, args.burst,
+                           args.hourly and args.format == "ndjson")
+
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    failed = 0
+    try:
+        # 获取过程中的错误提示改为输出到标准错误，不混入标准输出的数据
+        with redirect_stdout(sys.stderr):
+            for record in fetcher.run(cities):
+                failed += "error" in record
+                if writer is not None:
+                    writer.writerow(csv_row(record))
+                else:
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        weather_data.close()
+
+    if failed:
+        print(f"{failed}/{len(cities)} 个城市获取失败", file=sys.stderr)
+    # 有城市失败时返回非零状态，便于cron和脚本判断
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
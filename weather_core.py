@@ -0,0 +1,852 @@
+# 天气数据获取：和风天气API、城市ID缓存、HTTP连接复用、IP定位和多城市调度
+# 本模块不依赖PyQt和OpenGL，可以在没有显示器的环境中使用
+
+import sys
+import os
+import time
+import datetime
+import json
+import socket
+import sqlite3
+import threading
+import heapq
+import itertools
+import random
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from weather_records import Observation, DailyForecast
+from weather_hourly import HourlyForecast
+from weather_history import WeatherHistory
+from weather_cities import CityIndex, City
+
+
+# 和风天气API配置
+QWEATHER_KEY = os.environ.get('QWEATHER_KEY', '[Your_Qweather_API_KEY]') #这里需要一个可使用的API KEY
+# 可通过环境变量指向本地模拟服务器（见 benchmarks/mock_qweather.py）
+QWEATHER_BASE_URL = os.environ.get('QWEATHER_BASE_URL', "https://devapi.qweather.com/v7")
+QWEATHER_GEO_URL = os.environ.get('QWEATHER_GEO_URL', "https://geoapi.qweather.com/v2/city")
+# 多台电脑共用的本地缓存服务（见 weather_server.py），设置后客户端通过它获取数据，不再直接访问和风天气
+WEATHER_SERVICE_URL = os.environ.get('WEATHER_SERVICE_URL', '').rstrip('/')
+
+# 每个主机的连接池大小
+HTTP_POOL_SIZE = int(os.environ.get('WEATHER_HTTP_POOL_SIZE', '8'))
+# 和风天气每日请求配额（免费版为1000次/天）
+QWEATHER_DAILY_QUOTA = int(os.environ.get('QWEATHER_DAILY_QUOTA', '1000'))
+# 逐天预报天数，和风天气支持 3/7/10/15/30 天（免费版仅3天和7天）
+QWEATHER_FORECAST_DAYS = int(os.environ.get('QWEATHER_FORECAST_DAYS', '7'))
+# 逐小时预报时长，支持 24/72/168 小时（免费版仅24小时）
+QWEATHER_HOURLY_HOURS = int(os.environ.get('QWEATHER_HOURLY_HOURS', '24'))
+
+
+def get_cache_dir():
+    """获取用户缓存目录，可通过环境变量 WEATHER_CACHE_DIR 指定"""
+    path = os.environ.get("WEATHER_CACHE_DIR")
+    if not path:
+        if sys.platform.startswith("win"):
+            base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        elif sys.platform == "darwin":
+            base = os.path.expanduser("~/Library/Caches")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        path = os.path.join(base, "weather_app")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class LocationCache:
+    """城市名 → Location ID 缓存（内存LRU + SQLite持久化）"""
+
+    def __init__(self, path=None, capacity=256, ttl=30 * 24 * 3600):
+        self.capacity = capacity
+        self.ttl = ttl  # 缓存有效期，默认30天
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (location_id, 写入时间)
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            self.path = path or os.path.join(get_cache_dir(), "location_cache.db")
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS location ("
+                "city TEXT PRIMARY KEY, location_id TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            # 清理过期条目
+            self._db.execute("DELETE FROM location WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"打开城市缓存失败，仅使用内存缓存: {e}")
+            self._db = None
+
+    @staticmethod
+    def _key(city):
+        return city.strip().lower()
+
+    def _remember(self, key, location_id, created):
+        self._memory[key] = (location_id, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, city):
+        """查询缓存，未命中返回None"""
+        key = self._key(city)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT location_id, created FROM location WHERE city = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"读取城市缓存出错: {e}")
+                    row = None
+                if row is not None and now - row[1] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, city, location_id):
+        """写入缓存"""
+        key = self._key(city)
+        now = time.time()
+        with self._lock:
+            self._remember(key, location_id, now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO location (city, location_id, created) VALUES (?, ?, ?)",
+                        (key, location_id, now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"写入城市缓存出错: {e}")
+
+    def stats(self):
+        """返回缓存命中统计"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "size": len(self._memory)
+            }
+
+
+class HttpTransport:
+    """共享HTTP传输层：按主机复用长连接，支持gzip压缩"""
+
+    def __init__(self, pool_maxsize=HTTP_POOL_SIZE, pool_connections=8, timeout=10):
+        self.timeout = timeout
+        # pool_connections: 缓存的主机连接池个数; pool_maxsize: 每个主机保持的连接数
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # 会话在第一次请求时创建，requests 的导入也推迟到那时，不拖慢程序启动
+        self.session = None
+        self.adapter = None
+        self._request_counts = {}  # "主机:端口" -> 请求次数
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+        self.adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        self.session = session
+
+    def get(self, url, **kwargs):
+        """发送GET请求，复用对应主机的连接"""
+        kwargs.setdefault("timeout", self.timeout)
+        parts = urlsplit(url)
+        host = f"{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+        with self._lock:
+            if self.session is None:
+                self._connect()
+            self._request_counts[host] = self._request_counts.get(host, 0) + 1
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """返回每个主机的连接复用统计"""
+        with self._lock:
+            counts = dict(self._request_counts)
+
+        # 统计连接池中每个主机实际建立的连接数
+        connections = {}
+        pools = self.adapter.poolmanager.pools if self.adapter is not None else {}
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            host = f"{pool.host}:{pool.port}"
+            connections[host] = connections.get(host, 0) + pool.num_connections
+
+        result = {}
+        for host, requests_sent in counts.items():
+            opened = connections.get(host, 0)
+            result[host] = {
+                "requests": requests_sent,
+                "connections": opened,
+                "reused": max(requests_sent - opened, 0)
+            }
+        return result
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+class IpLocator:
+    """IP定位：同时查询所有服务商，采用最先返回的有效结果"""
+
+    def __init__(self, transport, deadline=5.0, cache_ttl=6 * 3600, cache_path=None):
+        self.transport = transport
+        self.deadline = deadline  # 整体超时时间（秒）
+        self.cache_ttl = cache_ttl
+        self.providers = []
+        self._cache = {}  # 网络标识 -> [城市, 写入时间]
+        self._lock = threading.Lock()
+        try:
+            self.cache_path = cache_path or os.path.join(get_cache_dir(), "ip_city.json")
+            with open(self.cache_path, encoding="utf-8") as f:
+                self._cache = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        self.register_provider("ipinfo.io", "https://ipinfo.io/json")
+        self.register_provider("ip.cn", "https://ip.cn/json")
+
+    def register_provider(self, name, url, parse=None):
+        """添加IP定位服务，parse(json数据)返回城市名，默认读取city字段"""
+        self.providers.append((name, url, parse or (lambda data: data.get("city"))))
+
+    @staticmethod
+    def network_key():
+        """用本机出口地址标识当前网络（UDP connect不会发送数据）"""
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.connect(("8.8.8.8", 80))
+                return sock.getsockname()[0]
+        except OSError:
+            return None
+
+    def _query(self, provider):
+        name, url, parse = provider
+        response = self.transport.get(url, timeout=self.deadline)
+        return parse(response.json())
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f, ensure_ascii=False)
+        except (OSError, AttributeError) as e:
+            print(f"保存定位缓存失败: {e}")
+
+    def locate(self):
+        """返回当前网络所在城市，全部失败时返回None"""
+        key = self.network_key()
+        with self._lock:
+            entry = self._cache.get(key) if key else None
+            if entry and time.time() - entry[1] < self.cache_ttl:
+                return entry[0]
+
+        if not self.providers:
+            return None
+
+        executor = ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="ip-locate")
+        futures = {executor.submit(self._query, provider): provider[0] for provider in self.providers}
+        end_time = time.monotonic() + self.deadline
+        pending = set(futures)
+        city = None
+        try:
+            # 空字符串等无效结果不算成功，继续等待其余服务商
+            while pending and not city:
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        city = future.result()
+                    except Exception as e:
+                        print(f"使用API {futures[future]} 获取城市失败: {e}")
+                        continue
+                    if city:
+                        break
+        finally:
+            # 不等待较慢的服务商，它们会在超时后自行结束
+            executor.shutdown(wait=False)
+
+        if not city:
+            print("所有IP查询API均失败")
+            return None
+
+        if key:
+            with self._lock:
+                self._cache[key] = [city, time.time()]
+                self._save_cache()
+        return city
+
+
+class SingleFlight:
+    """合并相同键的并发调用：某个键正在执行时，后到的调用等待并共享这次的结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}  # 键 -> Future
+        self._counts = {}  # 键的类别（键的第一个元素）-> [实际执行次数, 合并次数]
+
+    def do(self, key, func, *args):
+        """执行 func(*args)；相同的 key 正在执行时直接等待其结果。结果由所有调用者共享，不应修改"""
+        with self._lock:
+            counts = self._counts.setdefault(key[0], [0, 0])
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                counts[0] += 1
+                leader = True
+            else:
+                counts[1] += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+        """每类调用的实际执行次数和被合并的次数"""
+        with self._lock:
+            return {
+                kind: {
+                    "executed": executed,
+                    "coalesced": coalesced,
+                    "coalesced_rate": coalesced / (executed + coalesced) if executed + coalesced else 0.0
+                }
+                for kind, (executed, coalesced) in self._counts.items()
+            }
+
+
+class QuotaExceeded(Exception):
+    """和风天气每日请求配额已用完"""
+
+
+class WeatherData:
+    """天气数据管理类"""
+
+    def __init__(self, base_url=None, geo_url=None, key=None, daily_quota=None):
+        self.current = None  # Observation
+        self.forecast = DailyForecast.empty()
+        self.hourly = HourlyForecast.empty()
+        self.hourly_city = None  # 逐小时预报所属的城市
+        self.last_updated = None
+        self.city = "北京"
+        # 默认使用模块配置，测试时可以指向本地模拟服务器；配置了缓存服务时默认连接缓存服务
+        using_service = bool(WEATHER_SERVICE_URL) and not base_url
+        if WEATHER_SERVICE_URL:
+            self.base_url = base_url or f"{WEATHER_SERVICE_URL}/v7"
+            self.geo_url = geo_url or f"{WEATHER_SERVICE_URL}/v2/city"
+        else:
+            self.base_url = base_url or QWEATHER_BASE_URL
+            self.geo_url = geo_url or QWEATHER_GEO_URL
+        # 定时刷新、搜索、城市查询和关注城市的请求共用一个令牌桶，按每日配额平均分配请求速率；
+        # 突发容量取配额的十分之一。令牌桶只在本进程内有效，重新启动后从满额开始，不能代替跨进程的每日计数。
+        # 通过缓存服务获取时配额由服务计算，0 表示不限制
+        if daily_quota is None:
+            daily_quota = 0 if using_service else QWEATHER_DAILY_QUOTA
+        self.quota = None
+        if daily_quota > 0:
+            self.quota = TokenBucket.for_daily_quota(daily_quota, burst=max(20, daily_quota // 10))
+        self.key = key or QWEATHER_KEY
+        self.forecast_days = QWEATHER_FORECAST_DAYS
+        self.hourly_hours = QWEATHER_HOURLY_HOURS
+        self.location_cache = LocationCache()
+        # 离线城市索引，联网查询到的城市追加到缓存目录下的文件
+        self.city_index = CityIndex(user_path=os.path.join(get_cache_dir(), "city_index.tsv"))
+        self.transport = HttpTransport()
+        self.ip_locator = IpLocator(self.transport)
+        self.history = WeatherHistory(os.path.join(get_cache_dir(), "history.db"))
+        # 定时刷新、搜索、自动定位和关注城市可能同时请求同一城市，相同的请求只发送一次
+        self.flights = SingleFlight()
+        self.executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="weather-fetch")
+
+    def update_city(self, city):
+        self.city = city
+
+    def close(self):
+        """释放线程池和网络连接"""
+        self.executor.shutdown(wait=False)
+        self.transport.close()
+        self.history.close()
+
+    def _spend_quota(self):
+        """每次请求和风天气前取出一个令牌，配额用完时抛出 QuotaExceeded"""
+        if self.quota is not None and not self.quota.try_acquire():
+            raise QuotaExceeded("已达到和风天气每日请求配额")
+
+    def get_location_id(self, city):
+        """获取城市的Location ID"""
+        # 城市与ID的对应关系基本不变，优先使用缓存
+        location_id = self.location_cache.get(city)
+        if location_id:
+            return location_id
+        # 离线索引中能精确匹配时不需要联网查询
+        location_id = self.city_index.resolve(city)
+        if location_id:
+            return location_id
+        return self.flights.do(("lookup", city), self._lookup_location, city)
+
+    def _lookup_location(self, city):
+        """通过城市查询接口获取Location ID并写入缓存，配额用完时抛出 QuotaExceeded"""
+        self._spend_quota()
+        try:
+            response = self.transport.get(
+                f"{self.geo_url}/lookup",
+                params={
+                    "location": city,
+                    "key": self.key,
+                    "lang": "zh"
+                }
+            )
+            data = response.json()
+
+            if data["code"] != "200" or not data["location"]:
+                return None
+
+            # 返回第一个匹配的城市ID
+            location_id = data["location"][0]["id"]
+            self.location_cache.put(city, location_id)
+            # 查询结果写回离线索引，以后可以直接补全和匹配
+            for location in data["location"]:
+                self.city_index.add(City(location["id"], location["name"], "",
+                                         location.get("adm1", ""), location.get("adm2", "")))
+            return location_id
+
+        except Exception as e:
+            print(f"获取城市ID出错: {e}")
+            return None
+
+    def query_weather(self, endpoint, location_id):
+        """请求和风天气接口，如 weather/now、weather/7d"""
+        return self.flights.do(("endpoint", location_id, endpoint), self._query_weather,
+                               endpoint, location_id)
+
+    def _query_weather(self, endpoint, location_id):
+        self._spend_quota()
+        response = self.transport.get(
+            f"{self.base_url}/{endpoint}",
+            params={
+                "location": location_id,
+                "key": self.key,
+                "lang": "zh"
+            }
+        )
+        return response.json()
+
+    @staticmethod
+    def _collect(future, message):
+        """取出并发请求的结果，失败时返回错误信息"""
+        try:
+            data = future.result()
+        except Exception as e:
+            print(f"{message}: {e}")
+            return None, f"{message}: {e}"
+        if data.get("code") != "200":
+            return None, message
+        return data, None
+
+    def fetch_weather_data(self):
+        """获取当前城市的天气数据"""
+        result = self.fetch_city_weather(self.city)
+        self.apply_result(result)
+        return result
+
+    def apply_result(self, result):
+        """将 fetch_city_weather 的结果保存为当前天气数据"""
+        if "error" in result:
+            return
+        self.current = result["current"]
+        self.forecast = result["forecast"]
+        if result.get("hourly") is not None:
+            self.hourly = result["hourly"]
+            self.hourly_city = result["city"]
+        elif result["city"] != self.hourly_city:
+            # 逐小时预报获取失败时只沿用同一城市的旧数据，不显示其他城市的预报
+            self.hourly = HourlyForecast.empty()
+            self.hourly_city = None
+        self.last_updated = result["last_updated"]
+
+    def fetch_city_weather(self, city, hourly=True, hourly_hours=None):
+        """获取指定城市的天气数据，不修改当前城市的状态；hourly为False时不请求逐小时预报，
+        hourly_hours 只改变本次请求的逐小时预报时长
+
+        同一城市正在获取时不再重复请求，等待并返回同一个结果；预报天数或时长不同的请求不合并
+        """
+        days, hours = self.forecast_days, hourly_hours or self.hourly_hours
+        return self.flights.do(("city", city, hourly, days, hours), self._fetch_city_weather,
+                               city, hourly, days, hours)
+
+    def _fetch_city_weather(self, city, hourly, days, hours):
+        # 先获取城市ID
+        try:
+            location_id = self.get_location_id(city)
+        except QuotaExceeded as e:
+            return {"error": str(e), "city": city}
+        if not location_id:
+            return {"error": f"无法找到城市: {city}", "city": city}
+
+        try:
+            # 实时天气和逐天预报互不依赖，同时发出两个请求
+            current_future = self.executor.submit(self.query_weather, "weather/now", location_id)
+            forecast_future = self.executor.submit(
+                self.query_weather, f"weather/{days}d", location_id)
+            hourly_future = None
+            if hourly:
+                hourly_future = self.executor.submit(
+                    self.query_weather, f"weather/{hours}h", location_id)
+
+            current_data, current_error = self._collect(current_future, "获取实时天气失败")
+            forecast_data, forecast_error = self._collect(forecast_future, "获取天气预报失败")
+
+            errors = [error for error in (current_error, forecast_error) if error]
+            if errors:
+                return {"error": "；".join(errors), "city": city}
+
+            # 逐小时预报失败时不影响其余数据，保留上一次的结果
+            hourly_forecast = None
+            if hourly_future is not None:
+                hourly_data, hourly_error = self._collect(hourly_future, "获取逐小时预报失败")
+                if hourly_data:
+                    hourly_forecast = HourlyForecast.from_response(hourly_data)
+
+            # 接口返回的字符串在这里一次性解析为数值和带时区的时间
+            current = Observation.from_response(current_data)
+            forecast = DailyForecast.from_response(forecast_data)
+            self.record_history(city, current, forecast, hourly_forecast)
+
+            return {
+                "success": True,
+                "city": city,
+                "current": current,
+                "forecast": forecast,
+                "hourly": hourly_forecast,
+                "last_updated": datetime.datetime.now().astimezone()
+            }
+
+        except Exception as e:
+            print(f"获取天气数据出错: {e}")
+            return {"error": f"获取天气数据失败: {str(e)}", "city": city}
+
+
+    def record_history(self, city, current, forecast, hourly=None):
+        """把本次获取的实况和预报追加到历史库，出错时不影响天气数据的返回"""
+        try:
+            self.history.record_observation(city, current, time.time())
+            self.history.record_daily(city, forecast)
+            if hourly is not None:
+                self.history.record_hourly(city, hourly)
+        except Exception as e:
+            print(f"记录天气历史出错: {e}")
+
+    def get_public_city(self):
+        """根据公网IP获取所在城市，同时查询多个API并设置整体超时"""
+        return self.ip_locator.locate()
+
+    def get_city_by_location(self):
+        """通过IP定位获取城市名"""
+        try:
+            city = self.get_public_city()
+            return city
+        except:
+            print("获取城市失败,未知原因")
+            return None
+
+
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，用于限制请求频率"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_daily_quota(cls, quota, burst=20):
+        """根据每日配额创建令牌桶，同一进程连续运行24小时的请求总数不超过配额"""
+        burst = max(1, min(burst, quota // 2))
+        return cls((quota - burst) / 86400.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """尝试取出令牌，成功返回True"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def time_until(self, tokens=1):
+        """距离可以取出指定数量令牌还需等待的秒数"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self.tokens) / self.rate
+
+
+class RefreshSchedule:
+    """按数据源的发布节奏安排刷新：预计有新实况发布后稍等片刻再请求，失败时指数退避"""
+
+    def __init__(self, publish_interval=600, grace=60, min_interval=60, max_interval=1800,
+                 backoff_base=15, backoff_cap=600, seed=None):
+        self.default_publish_interval = publish_interval
+        self.grace = grace  # 预计发布时间之后再等待的秒数
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._random = random.Random(seed)
+        self.city = None
+        self.reset()
+
+    def reset(self):
+        """切换城市后重新估计发布周期"""
+        self.publish_interval = self.default_publish_interval
+        self.last_obs = None
+        self.failures = 0
+        self.unchanged = 0
+
+    def next_delay(self, result, now=None):
+        """根据 fetch_city_weather 的结果返回距下一次刷新的秒数"""
+        now = time.time() if now is None else now
+        # 失败的结果不代表切换了城市，保留已估计的发布周期
+        if "error" not in result and result.get("city") != self.city:
+            self.city = result.get("city")
+            self.reset()
+
+        if "error" in result:
+            # 退避时间指数增长，并在 [一半, 全部] 之间随机抖动，避免多个客户端同时重试
+            self.failures += 1
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** (self.failures - 1))
+            return self._random.uniform(delay / 2, delay)
+
+        self.failures = 0
+        obs_time = result["current"].time.timestamp()
+        if self.last_obs is not None:
+            if obs_time > self.last_obs:
+                # 用相邻两次观测的间隔估计发布周期，错过多次发布时的间隔不参与估计
+                elapsed = obs_time - self.last_obs
+                if elapsed <= 2 * self.publish_interval:
+                    self.publish_interval = 0.7 * self.publish_interval + 0.3 * elapsed
+                self.unchanged = 0
+            else:
+                self.unchanged += 1
+        self.last_obs = max(obs_time, self.last_obs or obs_time)
+
+        expected = self.last_obs + self.publish_interval + self.grace
+        if expected > now:
+            delay = expected - now
+        else:
+            # 已经过了预计发布时间但数据还没更新，逐渐拉长重试间隔
+            delay = self.min_interval * 2 ** self.unchanged
+        return min(max(delay, self.min_interval), self.max_interval)
+
+
+class CityMonitor:
+    """多城市监控调度器：优先队列安排刷新时间，共用 WeatherData 的配额令牌桶，有界线程池执行请求"""
+
+    # 每次刷新请求 weather/now 和 weather/7d，首次还需要一次城市查询
+    REFRESH_COST = 2
+    LOOKUP_COST = 1
+    # 为前台的定时刷新和搜索保留的令牌，关注城市只使用超出的部分
+    FOREGROUND_RESERVE = 4
+    # 前台定时刷新的平均请求速率：约每10分钟请求实况、逐天和逐小时预报
+    FOREGROUND_RATE = 3 / 600
+    # 最长刷新间隔（秒），配额不足以支持关注城市时也至少每天刷新一次
+    MAX_INTERVAL = 24 * 3600
+
+    def __init__(self, weather_data, callback, interval=1800, max_workers=4):
+        self.weather_data = weather_data
+        self.callback = callback  # callback(city, result)，在工作线程中调用
+        self.interval = interval
+        self.max_workers = max_workers
+        self.bucket = weather_data.quota  # 为None时不限制
+        self._executor = None
+        self._heap = []  # (到期时间, 序号, 城市)
+        self._scheduled = {}  # 城市 -> 有效的序号，用于惰性删除队列中过期的条目
+        self._counter = itertools.count()
+        self._resolved = set()  # 已查询过Location ID的城市
+        self._inflight = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def cities(self):
+        with self._cond:
+            return list(self._scheduled)
+
+    def sustainable_interval(self):
+        """当前城市数量下不超过配额的最短刷新间隔（秒）"""
+        with self._cond:
+            count = len(self._scheduled)
+        if self.bucket is None:
+            return 0.0
+        rate = self.bucket.rate - self.FOREGROUND_RATE
+        if rate <= 0:
+            return self.MAX_INTERVAL
+        return min(count * self.REFRESH_COST / rate, self.MAX_INTERVAL)
+
+    def _schedule(self, city, delay):
+        seq = next(self._counter)
+        self._scheduled[city] = seq
+        heapq.heappush(self._heap, (time.monotonic() + delay, seq, city))
+        self._cond.notify()
+
+    def add_city(self, city, delay=0):
+        """添加监控城市，delay秒后进行首次刷新"""
+        if self.bucket is not None and self.bucket.rate <= self.FOREGROUND_RATE:
+            print(f"每日配额不足以定时刷新关注城市，{city} 每 {self.MAX_INTERVAL // 3600} 小时刷新一次")
+        with self._cond:
+            if city not in self._scheduled:
+                self._schedule(city, delay)
+
+    def remove_city(self, city):
+        with self._cond:
+            self._scheduled.pop(city, None)
+            self._cond.notify()
+
+    def refresh(self, city):
+        """立即刷新指定城市"""
+        with self._cond:
+            if city in self._scheduled:
+                self._schedule(city, 0)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="city-monitor")
+        self._thread = threading.Thread(target=self._run, name="city-monitor-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due, seq, city = self._heap[0]
+                if self._scheduled.get(city) != seq:
+                    # 城市已移除或已重新安排
+                    heapq.heappop(self._heap)
+                    continue
+
+                delay = due - time.monotonic()
+                if delay > 0:
+                    # 等待时间过长时 Condition.wait 会溢出，分段等待
+                    self._cond.wait(min(delay, self.MAX_INTERVAL))
+                    continue
+
+                if city in self._inflight:
+                    # 正在刷新，完成后会重新安排
+                    heapq.heappop(self._heap)
+                    continue
+
+                if len(self._inflight) >= self.max_workers:
+                    self._cond.wait()
+                    continue
+
+                cost = self.REFRESH_COST
+                if city not in self._resolved:
+                    cost += self.LOOKUP_COST
+                # 令牌由实际发出的请求取出，这里只等待余量足够
+                wait = 0
+                if self.bucket is not None:
+                    wait = self.bucket.time_until(min(cost + self.FOREGROUND_RESERVE, self.bucket.capacity))
+                if wait > 0:
+                    # 配额不足，等待令牌补充
+                    self._cond.wait(min(wait, 60))
+                    continue
+
+                heapq.heappop(self._heap)
+                self._inflight.add(city)
+                self._executor.submit(self._refresh_city, city)
+
+    def _refresh_city(self, city):
+        try:
+            # 关注城市只显示概况，不请求逐小时预报以节省配额
+            result = self.weather_data.fetch_city_weather(city, hourly=False)
+        except Exception as e:
+            result = {"error": f"获取天气数据失败: {e}", "city": city}
+
+        try:
+            self.callback(city, result)
+        except Exception as e:
+            print(f"处理城市 {city} 的天气数据出错: {e}")
+
+        # 刷新间隔不低于配额允许的最小值
+        interval = max(self.interval, self.sustainable_interval())
+        with self._cond:
+            self._inflight.discard(city)
+            self._resolved.add(city)
+            if city in self._scheduled:
+                self._schedule(city, interval)
+            self._cond.notify()
@@ -0,0 +1,211 @@
+# 天气历史记录：每次获取的实况和预报都追加写入SQLite，按时间范围查询并降采样
+# 实况按 (城市, 时间) 聚簇存储，另维护一张按小时汇总的表，长时间范围的查询只需读汇总表
+
+import sqlite3
+import threading
+import numpy as np
+
+# 实况数值字段，与 Observation 的属性同名
+OBSERVATION_FIELDS = ("temp", "feels_like", "humidity", "wind_speed", "pressure", "vis", "precip")
+# 预报快照的数值字段
+FORECAST_FIELDS = ("temp_min", "temp_max", "precip", "pop", "humidity", "wind_speed")
+# 汇总表的时间粒度（秒）
+ROLLUP_BUCKET = 3600
+
+SCHEMA = [
+    # 主键即聚簇索引，同一城市的记录按时间连续存放；重复的观测时间被忽略
+    "CREATE TABLE IF NOT EXISTS observation ("
+    "city TEXT NOT NULL, ts INTEGER NOT NULL, fetched INTEGER NOT NULL, "
+    + ", ".join(f"{name} REAL" for name in OBSERVATION_FIELDS) +
+    ", text TEXT, icon TEXT, PRIMARY KEY (city, ts)) WITHOUT ROWID",
+    # 每小时的累计值，AVG = sum / count
+    "CREATE TABLE IF NOT EXISTS observation_hourly ("
+    "city TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, "
+    + ", ".join(f"{name}_sum REAL, {name}_count INTEGER" for name in OBSERVATION_FIELDS) +
+    ", temp_min REAL, temp_max REAL, PRIMARY KEY (city, bucket)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS forecast ("
+    "city TEXT NOT NULL, kind TEXT NOT NULL, issued INTEGER NOT NULL, target INTEGER NOT NULL, "
+    + ", ".join(f"{name} REAL" for name in FORECAST_FIELDS) +
+    ", PRIMARY KEY (city, kind, target, issued)) WITHOUT ROWID",
+]
+
+
+def _nullable(value):
+    """NaN 存为 NULL"""
+    return None if value != value else value
+
+
+class WeatherHistory:
+    """只追加的天气历史库，查询结果为NumPy列数组"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # WAL模式下写入不阻塞读取，NORMAL同步级别足以保证断电后数据库不损坏
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"打开天气历史库失败，不记录历史: {e}")
+            self._db = None
+
+    @property
+    def available(self):
+        return self._db is not None
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _write(self, statements):
+        """在一个事务中执行 [(sql, 参数列表)]"""
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                with self._db:
+                    for sql, rows in statements:
+                        self._db.executemany(sql, rows)
+            except sqlite3.Error as e:
+                print(f"写入天气历史出错: {e}")
+
+    def record_observation(self, city, observation, fetched):
+        """记录一次实况（Observation），同一观测时间只保存一次"""
+        ts = int(observation.time.timestamp())
+        values = [_nullable(getattr(observation, name)) for name in OBSERVATION_FIELDS]
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                with self._db:
+                    cursor = self._db.execute(
+                        f"INSERT OR IGNORE INTO observation VALUES ({', '.join('?' * (len(values) + 5))})",
+                        [city, ts, int(fetched)] + values + [observation.text, observation.icon]
+                    )
+                    if cursor.rowcount == 1:
+                        self._add_to_rollup(city, ts, values)
+            except sqlite3.Error as e:
+                print(f"写入天气历史出错: {e}")
+
+    def _add_to_rollup(self, city, ts, values):
+        """把新的实况累加到小时汇总表"""
+        names = list(OBSERVATION_FIELDS)
+        sums = []
+        for value in values:
+            sums += [value or 0.0, 0 if value is None else 1]
+        temp = values[names.index("temp")]
+        columns = ", ".join(f"{name}_sum, {name}_count" for name in names)
+        updates = ", ".join(
+            f"{name}_sum = {name}_sum + excluded.{name}_sum, "
+            f"{name}_count = {name}_count + excluded.{name}_count" for name in names
+        )
+        self._db.execute(
+            f"INSERT INTO observation_hourly (city, bucket, count, {columns}, temp_min, temp_max) "
+            f"VALUES ({', '.join('?' * (len(sums) + 5))}) "
+            f"ON CONFLICT (city, bucket) DO UPDATE SET count = count + 1, {updates}, "
+            "temp_min = MIN(COALESCE(temp_min, excluded.temp_min), COALESCE(excluded.temp_min, temp_min)), "
+            "temp_max = MAX(COALESCE(temp_max, excluded.temp_max), COALESCE(excluded.temp_max, temp_max))",
+            [city, ts - ts % ROLLUP_BUCKET, 1] + sums + [temp, temp]
+        )
+
+    def record_daily(self, city, daily):
+        """记录一次逐天预报快照（DailyForecast），预报时间为当地零点"""
+        if daily.issued is None:
+            return
+        utc_offset = int(daily.issued.utcoffset().total_seconds())
+        targets = daily.date.astype("datetime64[s]").astype(np.int64) - utc_offset
+        count = len(daily)
+        columns = zip([city] * count, ["daily"] * count, [int(daily.issued.timestamp())] * count,
+                      targets.tolist(), daily.temp_min.tolist(), daily.temp_max.tolist(),
+                      daily.precip.tolist(), [None] * count, daily.humidity.tolist(),
+                      daily.wind_speed.tolist())
+        rows = [[_nullable(value) for value in row] for row in columns]
+        self._write([(self._forecast_insert(), rows)])
+
+    def record_hourly(self, city, hourly):
+        """记录一次逐小时预报快照（HourlyForecast）"""
+        if hourly.issued is None:
+            return
+        count = len(hourly)
+        temps = hourly.temp.tolist()
+        columns = zip([city] * count, ["hourly"] * count, [int(hourly.issued.timestamp())] * count,
+                      hourly.time.tolist(), temps, temps, hourly.precip.tolist(), hourly.pop.tolist(),
+                      hourly.humidity.tolist(), hourly.wind_speed.tolist())
+        rows = [[_nullable(value) for value in row] for row in columns]
+        self._write([(self._forecast_insert(), rows)])
+
+    @staticmethod
+    def _forecast_insert():
+        return f"INSERT OR IGNORE INTO forecast VALUES ({', '.join('?' * (len(FORECAST_FIELDS) + 4))})"
+
+    def _query(self, sql, params, names):
+        """执行查询，返回 {列名: NumPy数组}，第一列为int64时间戳，其余为float64"""
+        with self._lock:
+            if self._db is None:
+                rows = []
+            else:
+                try:
+                    rows = self._db.execute(sql, params).fetchall()
+                except sqlite3.Error as e:
+                    print(f"读取天气历史出错: {e}")
+                    rows = []
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), len(names))
+        result = {names[0]: table[:, 0].astype(np.int64)}
+        for i, name in enumerate(names[1:], 1):
+            result[name] = table[:, i]
+        return result
+
+    def observations(self, city, start, end):
+        """查询 [start, end) 范围内的原始实况"""
+        names = ["time"] + list(OBSERVATION_FIELDS)
+        return self._query(
+            f"SELECT ts, {', '.join(OBSERVATION_FIELDS)} FROM observation "
+            "WHERE city = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (city, int(start), int(end)), names
+        )
+
+    def downsample(self, city, start, end, bucket, utc_offset=0):
+        """按bucket秒聚合 [start, end) 范围内的实况，返回各字段平均值以及每段的最低、最高气温
+
+        分段按 utc_offset（秒）所在时区对齐，按天聚合时每段从当地零点开始。
+        bucket 和 utc_offset 都是 ROLLUP_BUCKET 的整数倍时从小时汇总表计算，查询一年的数据也只需读取几千行
+        """
+        bucket = int(bucket)
+        utc_offset = int(utc_offset)
+        fields = list(OBSERVATION_FIELDS)
+        names = ["time"] + fields + ["temp_min", "temp_max", "count"]
+        if bucket >= ROLLUP_BUCKET and bucket % ROLLUP_BUCKET == 0 and utc_offset % ROLLUP_BUCKET == 0:
+            averages = ", ".join(f"SUM({name}_sum) / NULLIF(SUM({name}_count), 0)" for name in fields)
+            sql = (f"SELECT (bucket + ?5) / ?1 * ?1 - ?5 AS slot, {averages}, MIN(temp_min), MAX(temp_max), SUM(count) "
+                   "FROM observation_hourly WHERE city = ?2 AND bucket >= ?3 AND bucket < ?4 "
+                   "GROUP BY slot ORDER BY slot")
+            start -= start % ROLLUP_BUCKET
+        else:
+            averages = ", ".join(f"AVG({name})" for name in fields)
+            sql = (f"SELECT (ts + ?5) / ?1 * ?1 - ?5 AS slot, {averages}, MIN(temp), MAX(temp), COUNT(*) "
+                   "FROM observation WHERE city = ?2 AND ts >= ?3 AND ts < ?4 "
+                   "GROUP BY slot ORDER BY slot")
+        return self._query(sql, (bucket, city, int(start), int(end), utc_offset), names)
+
+    def forecast_snapshots(self, city, kind, start, end):
+        """查询预报时间在 [start, end) 范围内的预报快照，kind 为 daily 或 hourly"""
+        names = ["target", "issued"] + list(FORECAST_FIELDS)
+        return self._query(
+            f"SELECT target, issued, {', '.join(FORECAST_FIELDS)} FROM forecast "
+            "WHERE city = ? AND kind = ? AND target >= ? AND target < ? ORDER BY target, issued",
+            (city, kind, int(start), int(end)), names
+        )
+
+    def cities(self):
+        """有实况记录的城市"""
+        with self._lock:
+            if self._db is None:
+                return []
+            return [row[0] for row in self._db.execute("SELECT DISTINCT city FROM observation_hourly")]
@@ -0,0 +1,71 @@
+# 逐小时预报数据，只依赖NumPy：各字段解析一次后按列保存，绘图和统计直接使用数组
+
+import datetime
+import numpy as np
+from weather_records import float_column, offset_seconds, parse_datetime
+
+# 和风天气提供的逐小时预报时长（免费版仅24小时）
+HOURLY_HORIZONS = (24, 72, 168)
+
+
+class HourlyForecast:
+    """逐小时预报，各字段为按时间戳对齐的NumPy数组"""
+
+    # 列名 -> 和风天气字段名
+    COLUMNS = {
+        "temp": "temp",
+        "precip": "precip",
+        "pop": "pop",
+        "wind_speed": "windSpeed",
+        "humidity": "humidity",
+    }
+
+    def __init__(self, time, columns, text, icon, utc_offset=0, issued=None):
+        self.time = time  # int64 UNIX时间戳（秒）
+        self.utc_offset = utc_offset  # 预报所在时区的UTC偏移（秒）
+        self.issued = issued  # 预报发布时间，带时区
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+        self.text = text
+        self.icon = icon
+
+    @classmethod
+    def empty(cls):
+        columns = {name: np.empty(0, dtype=np.float32) for name in cls.COLUMNS}
+        return cls(np.empty(0, dtype=np.int64), columns, np.empty(0, dtype=str), np.empty(0, dtype=str))
+
+    @classmethod
+    def from_response(cls, data):
+        """解析 weather/24h、72h、168h 接口返回的数据"""
+        hourly = data.get("hourly") or []
+        issued = parse_datetime(data["updateTime"]) if data.get("updateTime") else None
+        if not hourly:
+            forecast = cls.empty()
+            forecast.issued = issued
+            return forecast
+
+        # fxTime 形如 2021-02-16T15:00+08:00，当地时间减去偏移得到UTC时间戳
+        local = np.array([item["fxTime"][:16] for item in hourly], dtype="datetime64[m]")
+        offsets = np.array([offset_seconds(item["fxTime"][16:]) for item in hourly], dtype=np.int64)
+        time = local.astype("datetime64[s]").astype(np.int64) - offsets
+        columns = {name: float_column(hourly, key) for name, key in cls.COLUMNS.items()}
+        text = np.array([item.get("text", "") for item in hourly])
+        icon = np.array([item.get("icon", "") for item in hourly])
+        return cls(time, columns, text, icon, int(offsets[0]), issued)
+
+    def __len__(self):
+        return len(self.time)
+
+    def column(self, name):
+        return getattr(self, name)
+
+    def head(self, hours):
+        """前hours小时的预报，各列为原数组的视图"""
+        columns = {name: getattr(self, name)[:hours] for name in self.COLUMNS}
+        return HourlyForecast(self.time[:hours], columns, self.text[:hours], self.icon[:hours],
+                              self.utc_offset, self.issued)
+
+    def label(self, index, fmt="%m-%d %H:%M"):
+        """格式化第index个时刻为当地时间"""
+        tz = datetime.timezone(datetime.timedelta(seconds=self.utc_offset))
+        return datetime.datetime.fromtimestamp(int(self.time[index]), tz).strftime(fmt)
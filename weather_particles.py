@@ -0,0 +1,111 @@
+# 雨雪粒子模拟，只依赖NumPy，不需要OpenGL即可运行和测试性能
+
+import numpy as np
+
+
+class ParticleSystem:
+    """粒子系统基类：粒子属性保存在连续的NumPy数组中，整体向量化更新"""
+
+    # 属性名 -> 重生时的均匀分布范围
+    FIELDS = {}
+
+    def __init__(self, count, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.active = False
+        self.resize(count)
+
+    def resize(self, count):
+        """调整粒子数量并重新生成所有粒子"""
+        self.count = count
+        for name in self.FIELDS:
+            setattr(self, name, np.empty(count, dtype=np.float32))
+        self.respawn(np.ones(count, dtype=bool))
+
+    def respawn(self, mask):
+        """重新生成mask选中的粒子"""
+        n = int(np.count_nonzero(mask))
+        if n == 0:
+            return
+        for name, (low, high) in self.FIELDS.items():
+            getattr(self, name)[mask] = self.rng.uniform(low, high, n)
+
+    def update(self, steps=1.0):
+        """推进steps步，由子类实现"""
+        raise NotImplementedError
+
+    def vertices(self):
+        """返回所有粒子的顶点数组 (N, 3)，由子类实现"""
+        raise NotImplementedError
+
+
+class RainSystem(ParticleSystem):
+    """雨滴粒子系统"""
+
+    FIELDS = {
+        "x": (-1.5, 1.5),
+        "y": (0.5, 1.5),
+        "z": (-1.0, 1.0),
+        "length": (0.03, 0.08),
+        "speed": (0.01, 0.03)
+    }
+
+    def resize(self, count):
+        self._vertices = np.empty((count, 2, 3), dtype=np.float32)
+        super().resize(count)
+
+    def update(self, steps=1.0):
+        """更新雨滴位置，落到地面的雨滴重新生成"""
+        self.y -= self.speed * steps
+        self.respawn(self.y < -1.0)
+
+    def vertices(self):
+        """每个雨滴是一条线段（GL_LINES，2个顶点）"""
+        out = self._vertices
+        out[:, 0, 0] = self.x
+        out[:, 0, 1] = self.y
+        out[:, 0, 2] = self.z
+        out[:, 1, 0] = self.x
+        out[:, 1, 1] = self.y - self.length
+        out[:, 1, 2] = self.z
+        return out.reshape(-1, 3)
+
+
+class SnowSystem(ParticleSystem):
+    """雪花粒子系统"""
+
+    FIELDS = {
+        "x": (-1.5, 1.5),
+        "y": (0.5, 1.5),
+        "z": (-1.0, 1.0),
+        "size": (0.01, 0.03),
+        "speed": (0.005, 0.015),
+        "rotation": (0, 360),
+        "rotation_speed": (-1, 1)
+    }
+
+    # 六边形的单位顶点，按扇形拆成4个三角形
+    HEXAGON = np.stack([np.cos(np.arange(6) * np.pi / 3),
+                        np.sin(np.arange(6) * np.pi / 3)], axis=1).astype(np.float32)
+    HEXAGON_TRIANGLES = HEXAGON[[0, 1, 2, 0, 2, 3, 0, 3, 4, 0, 4, 5]]
+
+    def resize(self, count):
+        self._vertices = np.empty((count, len(self.HEXAGON_TRIANGLES), 3), dtype=np.float32)
+        super().resize(count)
+
+    def update(self, steps=1.0):
+        """更新雪花位置，落到地面的雪花重新生成"""
+        self.y -= self.speed * steps
+        self.x += np.sin(self.y * 2) * (0.005 * steps)  # 左右摇摆
+        self.rotation += self.rotation_speed * steps
+        self.respawn(self.y < -1.0)
+
+    def vertices(self):
+        """每片雪花是绕Y轴旋转的六边形（GL_TRIANGLES，12个顶点）"""
+        theta = np.radians(self.rotation)
+        local_x = self.HEXAGON_TRIANGLES[:, 0] * self.size[:, None]
+        local_y = self.HEXAGON_TRIANGLES[:, 1] * self.size[:, None]
+        out = self._vertices
+        out[:, :, 0] = self.x[:, None] + local_x * np.cos(theta)[:, None]
+        out[:, :, 1] = self.y[:, None] + local_y
+        out[:, :, 2] = self.z[:, None] - local_x * np.sin(theta)[:, None]
+        return out.reshape(-1, 3)
@@ -0,0 +1,158 @@
+# 天气数据记录：接口返回的字符串只在这里解析一次，之后都使用数值和带时区的时间
+# 实况为NamedTuple，逐天预报按列保存为NumPy数组
+
+import datetime
+import functools
+from typing import NamedTuple, Tuple
+import numpy as np
+
+
+def float_column(items, key):
+    """把一个字段的字符串值整体转换为float32数组，缺失或空值记为NaN"""
+    values = np.array([item.get(key) or "nan" for item in items])
+    return values.astype(np.float32)
+
+
+def _number(value):
+    """数值字符串转为float，缺失或无效时为NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def offset_seconds(suffix):
+    """解析时间字符串末尾的UTC偏移，如 +08:00"""
+    if not suffix or suffix == "Z":
+        return 0
+    sign = -1 if suffix[0] == "-" else 1
+    return sign * (int(suffix[1:3]) * 3600 + int(suffix[4:6]) * 60)
+
+
+@functools.lru_cache(maxsize=None)
+def _timezone(offset):
+    return datetime.timezone(datetime.timedelta(seconds=offset))
+
+
+def parse_datetime(text):
+    """把和风天气的时间字符串（如 2021-02-16T15:00+08:00）转换为带时区的datetime"""
+    return datetime.datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                             int(text[11:13]), int(text[14:16]),
+                             tzinfo=_timezone(offset_seconds(text[16:])))
+
+
+class Observation(NamedTuple):
+    """一次实况观测（weather/now）"""
+    time: datetime.datetime  # 观测时间，带时区
+    temp: float
+    feels_like: float
+    humidity: float
+    wind_speed: float
+    wind_dir: str
+    wind_scale: str
+    pressure: float
+    vis: float
+    precip: float
+    text: str
+    icon: str
+    sources: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_response(cls, data):
+        now = data["now"]
+        return cls(
+            time=parse_datetime(now["obsTime"]),
+            temp=_number(now.get("temp")),
+            feels_like=_number(now.get("feelsLike")),
+            humidity=_number(now.get("humidity")),
+            wind_speed=_number(now.get("windSpeed")),
+            wind_dir=now.get("windDir", ""),
+            wind_scale=now.get("windScale", ""),
+            pressure=_number(now.get("pressure")),
+            vis=_number(now.get("vis")),
+            precip=_number(now.get("precip")),
+            text=now.get("text", ""),
+            icon=now.get("icon", ""),
+            sources=tuple(data.get("refer", {}).get("sources", ()))
+        )
+
+
+class ForecastDay(NamedTuple):
+    """逐天预报中的一天，由 DailyForecast 按需生成"""
+    date: datetime.date
+    temp_max: float
+    temp_min: float
+    text_day: str
+    text_night: str
+    icon: str
+    wind_dir: str
+    wind_scale: str
+    precip: float
+    humidity: float
+    sunrise: str
+    sunset: str
+
+
+class DailyForecast:
+    """逐天预报（weather/3d ~ 30d），各字段按列保存为NumPy数组"""
+
+    # 数值列名 -> 和风天气字段名
+    COLUMNS = {
+        "temp_max": "tempMax",
+        "temp_min": "tempMin",
+        "precip": "precip",
+        "humidity": "humidity",
+        "wind_speed": "windSpeedDay",
+    }
+    # 文字列名 -> 和风天气字段名
+    TEXT_COLUMNS = {
+        "text_day": "textDay",
+        "text_night": "textNight",
+        "icon": "iconDay",
+        "wind_dir": "windDirDay",
+        "wind_scale": "windScaleDay",
+        "sunrise": "sunrise",
+        "sunset": "sunset",
+    }
+
+    def __init__(self, date, columns, issued=None):
+        self.date = date  # datetime64[D]
+        self.issued = issued  # 预报发布时间，带时区
+        for name in list(self.COLUMNS) + list(self.TEXT_COLUMNS):
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def empty(cls):
+        columns = {name: np.empty(0, dtype=np.float32) for name in cls.COLUMNS}
+        columns.update({name: np.empty(0, dtype=str) for name in cls.TEXT_COLUMNS})
+        return cls(np.empty(0, dtype="datetime64[D]"), columns)
+
+    @classmethod
+    def from_response(cls, data):
+        daily = data.get("daily") or []
+        issued = parse_datetime(data["updateTime"]) if data.get("updateTime") else None
+        if not daily:
+            forecast = cls.empty()
+            forecast.issued = issued
+            return forecast
+        columns = {name: float_column(daily, key) for name, key in cls.COLUMNS.items()}
+        columns.update({name: np.array([day.get(key, "") for day in daily])
+                        for name, key in cls.TEXT_COLUMNS.items()})
+        date = np.array([day["fxDate"] for day in daily], dtype="datetime64[D]")
+        return cls(date, columns, issued)
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, index):
+        return ForecastDay(
+            self.date[index].item(), float(self.temp_max[index]), float(self.temp_min[index]),
+            str(self.text_day[index]), str(self.text_night[index]), str(self.icon[index]),
+            str(self.wind_dir[index]), str(self.wind_scale[index]),
+            float(self.precip[index]), float(self.humidity[index]),
+            str(self.sunrise[index]), str(self.sunset[index])
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
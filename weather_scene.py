@@ -0,0 +1,129 @@
+# 天气场景编译：天气变化时把和风天气图标代码（或天气描述）转换为不可变的场景描述，
+# 渲染循环只读取结果，不再每帧做字符串匹配。本模块不依赖OpenGL。
+
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+
+class SceneConfig(NamedTuple):
+    """3D场景描述"""
+    category: str  # 天气类别
+    sky: Optional[str]  # SKY_PALETTES 中的天空配色，None 表示不绘制天空盒
+    clouds: bool  # 是否绘制云朵
+    light_diffuse: Tuple[float, float, float, float]  # 主光源漫反射颜色
+    ground_color: Tuple[float, float, float]
+    rain_count: int  # 雨滴数量，0 表示不下雨
+    snow_count: int  # 雪花数量，0 表示不下雪
+
+
+# 降水强度 -> 粒子数量
+PARTICLE_BUDGETS = {
+    "light": 300,
+    "moderate": 1000,
+    "heavy": 3000,
+    "storm": 6000
+}
+
+GRASS_COLOR = (0.3, 0.6, 0.2)
+SNOW_GROUND_COLOR = (0.9, 0.95, 1.0)
+
+# 天气类别 -> (天空, 云朵, 光照, 地面, 是否下雨, 是否下雪)
+SCENE_PRESETS = {
+    "clear": ("clear", True, (1.0, 1.0, 0.9, 1.0), GRASS_COLOR, False, False),
+    "cloudy": ("cloudy", True, (0.7, 0.7, 0.7, 1.0), GRASS_COLOR, False, False),
+    "rain": ("rain", False, (0.5, 0.5, 0.6, 1.0), GRASS_COLOR, True, False),
+    "thunderstorm": ("rain", False, (0.5, 0.5, 0.6, 1.0), GRASS_COLOR, True, False),
+    "sleet": ("rain", False, (0.5, 0.5, 0.6, 1.0), SNOW_GROUND_COLOR, True, True),
+    "snow": ("snow", False, (0.5, 0.5, 0.6, 1.0), SNOW_GROUND_COLOR, False, True),
+    "fog": (None, False, (0.8, 0.8, 0.8, 1.0), GRASS_COLOR, False, False),
+    "unknown": (None, False, (0.8, 0.8, 0.8, 1.0), GRASS_COLOR, False, False)
+}
+
+# 和风天气降水图标代码 -> 强度
+RAIN_INTENSITY = {
+    300: "moderate", 301: "heavy", 302: "moderate", 303: "heavy", 304: "heavy",
+    305: "light", 306: "moderate", 307: "heavy", 308: "storm", 309: "light",
+    310: "storm", 311: "storm", 312: "storm", 313: "moderate", 314: "light",
+    315: "moderate", 316: "heavy", 317: "storm", 318: "storm",
+    350: "moderate", 351: "heavy", 399: "moderate"
+}
+SNOW_INTENSITY = {
+    400: "light", 401: "moderate", 402: "heavy", 403: "storm", 404: "moderate",
+    405: "moderate", 406: "moderate", 407: "moderate", 408: "light", 409: "heavy",
+    410: "storm", 456: "moderate", 457: "moderate", 499: "moderate"
+}
+SLEET_ICONS = {404, 405, 406, 456}
+THUNDER_ICONS = {302, 303, 304}
+
+
+def classify_icon(icon):
+    """根据和风天气图标代码返回 (类别, 强度)，无法识别时返回 (None, None)"""
+    try:
+        code = int(icon)
+    except (TypeError, ValueError):
+        return None, None
+
+    if code in (100, 150):
+        return "clear", None
+    if 101 <= code <= 104 or 151 <= code <= 154:
+        return "cloudy", None
+    if code in THUNDER_ICONS:
+        return "thunderstorm", RAIN_INTENSITY[code]
+    if code in RAIN_INTENSITY:
+        return "rain", RAIN_INTENSITY[code]
+    if code in SLEET_ICONS:
+        return "sleet", SNOW_INTENSITY[code]
+    if code in SNOW_INTENSITY:
+        return "snow", SNOW_INTENSITY[code]
+    if 500 <= code <= 515:
+        return "fog", None
+    return None, None
+
+
+def classify_text(text):
+    """根据天气描述返回 (类别, 强度)，用于图标代码缺失或无法识别时"""
+    text = text or ""
+    if "小" in text or "毛毛" in text:
+        intensity = "light"
+    elif "暴" in text:
+        intensity = "storm"
+    elif "大" in text:
+        intensity = "heavy"
+    else:
+        intensity = "moderate"
+
+    if "雷" in text:
+        return "thunderstorm", intensity
+    if "雨" in text and "雪" in text:
+        return "sleet", intensity
+    if "雨" in text:
+        return "rain", intensity
+    if "雪" in text:
+        return "snow", intensity
+    if "晴" in text:
+        return "clear", None
+    if "云" in text or "阴" in text:
+        return "cloudy", None
+    if any(key in text for key in ("雾", "霾", "沙", "尘")):
+        return "fog", None
+    return "unknown", None
+
+
+@lru_cache(maxsize=64)
+def compile_scene(icon=None, text=""):
+    """把天气转换为场景描述：优先使用图标代码，其次使用天气描述"""
+    category, intensity = classify_icon(icon)
+    if category is None:
+        category, intensity = classify_text(text)
+
+    sky, clouds, light, ground, rain, snow = SCENE_PRESETS[category]
+    budget = PARTICLE_BUDGETS.get(intensity or "moderate", PARTICLE_BUDGETS["moderate"])
+    return SceneConfig(
+        category=category,
+        sky=sky,
+        clouds=clouds,
+        light_diffuse=light,
+        ground_color=ground,
+        rain_count=budget if rain else 0,
+        snow_count=budget if snow else 0
+    )
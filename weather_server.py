@@ -0,0 +1,260 @@
+# 本地天气缓存服务：多台电脑共用一次上游请求，节省和风天气的调用配额
+#
+#     python weather_server.py --host 0.0.0.0 --port 8765
+#     export WEATHER_SERVICE_URL=http://服务器地址:8765
+#
+# 接口与和风天气相同（/v2/city/lookup、/v7/weather/now、/v7/weather/{天数}d、/v7/weather/{小时}h），
+# 客户端设置 WEATHER_SERVICE_URL 后无需API KEY。响应按 stale-while-revalidate 缓存：新鲜期内直接返回；
+# 过期但仍在可用期内时先返回旧数据，再在后台刷新；同一城市同一接口同一时间只有一次上游请求。
+# 不依赖PyQt和OpenGL
+
+import argparse
+import gzip
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from weather_core import WeatherData, QuotaExceeded, QWEATHER_BASE_URL, QWEATHER_GEO_URL
+
+# 允许转发的天气接口，避免被当作任意代理使用
+WEATHER_ENDPOINT = re.compile(r"^weather/(now|\d+d|\d+h)$")
+# 各接口的新鲜期（秒）：实况约10分钟发布一次，预报约每小时更新
+FRESH_TTL = {"now": 600, "daily": 3600, "hourly": 3600}
+# 过期数据最多继续使用的时间（秒），超过后必须等待上游返回
+STALE_TTL = 6 * 3600
+# 缓存的最大条目数，每个城市每个接口一条
+MAX_ENTRIES = 4096
+
+
+def endpoint_kind(endpoint):
+    """weather/now → now，weather/7d → daily，weather/24h → hourly"""
+    name = endpoint.rsplit("/", 1)[-1]
+    if name == "now":
+        return "now"
+    return "hourly" if name.endswith("h") else "daily"
+
+
+class WeatherService:
+    """按 stale-while-revalidate 缓存和风天气接口的响应"""
+
+    def __init__(self, weather_data, fresh_ttl=None, stale_ttl=STALE_TTL, max_workers=4,
+                 max_entries=MAX_ENTRIES):
+        self.weather_data = weather_data
+        self.fresh_ttl = dict(FRESH_TTL, **(fresh_ttl or {}))
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.counts = {"fresh": 0, "stale": 0, "miss": 0, "errors": 0, "evicted": 0}
+        self._cache = OrderedDict()  # (接口, Location ID) -> (响应, 获取时间)，按获取时间排列
+        self._refreshing = set()  # 正在后台刷新的键
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather-revalidate")
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _fetch(self, key):
+        """请求上游并写入缓存，网络出错时返回None；并发的相同请求由 WeatherData 合并"""
+        endpoint, location = key
+        try:
+            data = self.weather_data.query_weather(endpoint, location)
+        except Exception as e:
+            print(f"请求 {endpoint} ({location}) 出错: {e}")
+            self._count("errors")
+            return None
+        if data.get("code") == "200":
+            with self._lock:
+                self._store(key, data)
+        else:
+            self._count("errors")
+        return data
+
+    def _store(self, key, data):
+        """写入缓存，并从最早获取的一端删除超过可用期或超出容量的条目"""
+        now = time.monotonic()
+        self._cache[key] = (data, now)
+        self._cache.move_to_end(key)
+        while self._cache:
+            oldest = next(iter(self._cache.values()))
+            if now - oldest[1] < self.stale_ttl and len(self._cache) <= self.max_entries:
+                break
+            self._cache.popitem(last=False)
+            self.counts["evicted"] += 1
+
+    def _revalidate(self, key):
+        """在后台刷新过期的条目，同一个键同时只刷新一次"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key)
+
+    def _refresh(self, key):
+        try:
+            self._fetch(key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def weather(self, endpoint, location):
+        """返回 (响应, 缓存状态)，缓存状态为 fresh、stale 或 miss"""
+        key = (endpoint, location)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None:
+            data, fetched = entry
+            age = time.monotonic() - fetched
+            if age < self.fresh_ttl[endpoint_kind(endpoint)]:
+                self._count("fresh")
+                return data, "fresh"
+            if age < self.stale_ttl:
+                self._count("stale")
+                self._revalidate(key)
+                return data, "stale"
+
+        self._count("miss")
+        data = self._fetch(key)
+        if data is None or data.get("code") != "200":
+            # 上游失败时，即使超过可用期也优先返回旧数据
+            if entry is not None:
+                return entry[0], "stale"
+            return data or {"code": "500"}, "miss"
+        return data, "miss"
+
+    def lookup(self, city):
+        """城市查询，使用 WeatherData 的城市ID缓存"""
+        try:
+            location_id = self.weather_data.get_location_id(city)
+        except QuotaExceeded as e:
+            print(f"查询城市 {city} 失败: {e}")
+            # 与和风天气的"超过访问次数"状态码一致
+            return {"code": "402", "location": []}
+        if not location_id:
+            return {"code": "404", "location": []}
+        # 带上离线索引中的行政区，客户端写回自己的索引
+        known = self.weather_data.city_index.get(location_id)
+        location = {"name": city, "id": location_id}
+        if known is not None:
+            location.update(name=known.name, adm1=known.adm1, adm2=known.adm2)
+        return {"code": "200", "location": [location]}
+
+    def stats(self):
+        with self._lock:
+            result = dict(self.counts, entries=len(self._cache))
+        served = result["fresh"] + result["stale"] + result["miss"]
+        result["hit_rate"] = (result["fresh"] + result["stale"]) / served if served else 0.0
+        # 实际发往上游的请求数见 flights 中 endpoint 的 executed
+        result["flights"] = self.weather_data.flights.stats()
+        result["location_cache"] = self.weather_data.location_cache.stats()
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class WeatherServer:
+    """提供HTTP/JSON接口的缓存服务"""
+
+    def __init__(self, service, host="127.0.0.1", port=8765):
+        self.service = service
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def root_url(self):
+        """对应客户端的 WEATHER_SERVICE_URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程中运行"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="weather-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _respond(self, path, params):
+        """返回 (HTTP状态码, JSON数据, 缓存状态)"""
+        location = params.get("location")
+        if path == "/stats":
+            return 200, self.service.stats(), None
+        if path == "/v2/city/lookup" and location:
+            return 200, self.service.lookup(location), None
+        if path.startswith("/v7/") and location:
+            endpoint = path[len("/v7/"):]
+            if WEATHER_ENDPOINT.match(endpoint):
+                data, state = self.service.weather(endpoint, location)
+                return 200, data, state
+        return 404, {"code": "404"}, None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持长连接
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                try:
+                    status, data, state = server._respond(parts.path, params)
+                except Exception as e:
+                    print(f"处理请求 {parts.path} 出错: {e}")
+                    status, data, state = 500, {"code": "500"}, None
+
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                if state:
+                    self.send_header("X-Cache", state)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地天气缓存服务，多个客户端共用一次和风天气请求")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，局域网共享时使用 0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--now-ttl", type=float, default=FRESH_TTL["now"] / 60, help="实况的新鲜期（分钟）")
+    parser.add_argument("--forecast-ttl", type=float, default=FRESH_TTL["daily"] / 60, help="预报的新鲜期（分钟）")
+    parser.add_argument("--stale-ttl", type=float, default=STALE_TTL / 3600, help="过期数据最多继续使用的时间（小时）")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES, help="最多缓存的响应数")
+    args = parser.parse_args()
+
+    # 服务自身总是直接访问和风天气，不受 WEATHER_SERVICE_URL 影响
+    weather_data = WeatherData(base_url=QWEATHER_BASE_URL, geo_url=QWEATHER_GEO_URL)
+    fresh_ttl = {"now": args.now_ttl * 60, "daily": args.forecast_ttl * 60, "hourly": args.forecast_ttl * 60}
+    service = WeatherService(weather_data, fresh_ttl, args.stale_ttl * 3600, max_entries=args.max_entries)
+    server = WeatherServer(service, args.host, args.port)
+    print(f"天气缓存服务已启动: {server.root_url}")
+    print(f"  WEATHER_SERVICE_URL={server.root_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        service.close()
+        weather_data.close()
+
+
+if __name__ == "__main__":
+    main()